@@ -1,4 +1,10 @@
+import asyncio
+import logging
+import math
 import os
+import time
+from collections import OrderedDict
+
 import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -9,32 +15,122 @@ CLERK_JWKS_URL = os.getenv(
     "CLERK_JWKS_URL",
     "https://thankful-lamprey-62.clerk.accounts.dev/.well-known/jwks.json",
 )
+JWKS_TTL_SECONDS = float(os.getenv("JWKS_TTL_SECONDS", "3600"))
+# Minimum gap between refetches triggered by an unknown kid, so garbage
+# tokens can't turn into a flood of requests against the JWKS endpoint.
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
 
 bearer_scheme = HTTPBearer()
-_jwks_cache: dict | None = None
+logger = logging.getLogger("calisheet.auth")
+
+
+# ─── Signing keys ─────────────────────────────────────────────────────────────
 
+class KeyStore:
+    """Parsed JWKS public keys indexed by kid, refreshed on a TTL."""
 
-async def _get_jwks() -> dict:
-    global _jwks_cache
-    if _jwks_cache is None:
+    def __init__(self, url: str, ttl: float, min_refresh: float):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._keys: dict[str, RSAKey] = {}
+        # monotonic() counts from boot, so 0.0 could still look fresh
+        self._fetched_at = -math.inf
+        self._attempted_at = -math.inf
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self) -> dict:
         async with httpx.AsyncClient() as client:
-            resp = await client.get(CLERK_JWKS_URL)
+            resp = await client.get(self.url)
             resp.raise_for_status()
-            _jwks_cache = resp.json()
-    return _jwks_cache
+            return resp.json()
+
+    def load(self, jwks: dict):
+        keys = {}
+        for k in jwks.get("keys", []):
+            if k.get("kty") != "RSA" or "kid" not in k:
+                continue
+            keys[k["kid"]] = RSAKey(k, "RS256")
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    async def _refresh(self, min_age: float):
+        # Single flight: whoever gets the lock refetches, everyone queued
+        # behind it sees the fresh timestamp and returns without fetching.
+        # A failed fetch also holds off retries for min_refresh.
+        async with self._lock:
+            now = time.monotonic()
+            if now - self._fetched_at < min_age or now - self._attempted_at < self.min_refresh:
+                return
+            self._attempted_at = now
+            self.load(await self._fetch())
+
+    async def get(self, kid: str) -> RSAKey | None:
+        if time.monotonic() - self._fetched_at >= self.ttl:
+            try:
+                await self._refresh(self.ttl)
+            except httpx.HTTPError:
+                if not self._keys:
+                    raise
+                # Expired keys beat no keys while the endpoint is down
+                logger.warning("JWKS refresh failed; serving cached keys", exc_info=True)
+        key = self._keys.get(kid)
+        if key is None:
+            # Unknown kid usually means the issuer rotated keys
+            await self._refresh(self.min_refresh)
+            key = self._keys.get(kid)
+        return key
+
+
+# ─── Verified tokens ──────────────────────────────────────────────────────────
+
+class TokenCache:
+    """Bounded LRU of already-verified tokens, each valid until its exp."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, token: str) -> str | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        user_id, exp = entry
+        if exp <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user_id
+
+    def put(self, token: str, user_id: str, exp: float | None):
+        if exp is None or self.maxsize <= 0:
+            return
+        self._entries[token] = (user_id, exp)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+key_store = KeyStore(CLERK_JWKS_URL, JWKS_TTL_SECONDS, JWKS_MIN_REFRESH_SECONDS)
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
 
 
 async def get_current_user_id(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ) -> str:
     token = credentials.credentials
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
-        jwks = await _get_jwks()
         # Get the key id from the token header
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
-        # Find matching key
-        key = next((k for k in jwks["keys"] if k["kid"] == kid), None)
+        key = await key_store.get(kid)
         if key is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token key")
         payload = jwt.decode(
@@ -46,6 +142,9 @@ async def get_current_user_id(
         user_id: str = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing subject")
+        token_cache.put(token, user_id, payload.get("exp"))
         return user_id
     except JWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+    except httpx.HTTPError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Signing keys unavailable")
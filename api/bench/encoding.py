@@ -0,0 +1,127 @@
+"""Bytes on the wire and encode time per endpoint, format and content coding.
+
+Payloads are built in the shape the handlers return, so no database is
+needed. Their rows repeat more than real data does, so compressed sizes
+are on the optimistic side. Codings and MessagePack appear only when their
+packages are installed.
+
+Run from api/:  python -m bench.encoding [--routines N] [--page N] [--repeat N]
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from compress import CODECS, compress_body
+from responses import JSON, MSGPACK, render, ormsgpack
+
+_NOW = datetime(2026, 10, 3, 18, 30, tzinfo=timezone.utc)
+
+
+def _routine(i: int) -> dict:
+    return {
+        "id": i,
+        "user_id": "user_bench",
+        "title": f"Rutina {i}",
+        "subtitle": "Fuerza",
+        "tags": '["Anillas", "Barra"]',
+        "schedule_days": '["Lun", "Mi\\u00e9", "Vie"]',
+        "last_performed": "3 Oct 2026",
+        "completion_rate": 75,
+        "streak": "3 semanas",
+        "exercises_count": 6,
+    }
+
+
+def routine_list(n: int) -> list[dict]:
+    return [_routine(i) for i in range(n)]
+
+
+def routine_detail(exercises: int = 8) -> dict:
+    return {
+        "routine": _routine(1),
+        "exercises": [
+            {
+                "id": 100 + i,
+                "routine_id": 1,
+                "exercise_id": i + 1,
+                "name": "Dominadas lastradas",
+                "muscle": "Espalda",
+                "equipment": '["Barra", "Lastre"]',
+                "rest_seconds": 120,
+                "sort_order": i,
+                "rows": [
+                    {"id": 1000 + 3 * i + j, "sets": "3", "reps": "8", "weight": "10", "nivel_anillas": ""}
+                    for j in range(3)
+                ],
+            }
+            for i in range(exercises)
+        ],
+    }
+
+
+def history_page(n: int) -> dict:
+    return {
+        "entries": [
+            {
+                "sessionId": i,
+                "date": (_NOW - timedelta(days=2 * i)).strftime("%d %b %Y").lstrip("0"),
+                "routineName": "Empuje",
+                "sets": [
+                    {"weight": 10.0 + j, "reps": 8 - j, "rpe": 8.5, "nivelAnillas": None}
+                    for j in range(5)
+                ],
+                "totalVolume": 370.0,
+            }
+            for i in range(n)
+        ],
+        "nextCursor": "MjAyNi0wOS0zMFQyMzowMDowMCswMDowMHwy",
+    }
+
+
+def overview(n: int) -> dict:
+    months = ["Nov", "Dec", "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct"]
+    return {
+        "stats": {"maxReps": 12, "maxWeight": 25.0, "totalSessions": 48, "totalVolume": 18250.0},
+        "history": history_page(n),
+        "volume": [
+            {"month": month, "volume": 1500.0 + 10 * k, "label": f"{1500 + 10 * k} kg"}
+            for k, month in enumerate(months)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routines", type=int, default=50, help="rows in GET /routines")
+    parser.add_argument("--page", type=int, default=20, help="entries per history page")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        ("GET /routines", routine_list(args.routines)),
+        ("GET /routines/{routine_id}", routine_detail()),
+        ("GET /history/sessions", history_page(args.page)),
+        ("GET /history/overview", overview(args.page)),
+    ]
+    formats = [("json", JSON)] + ([("msgpack", MSGPACK)] if ormsgpack is not None else [])
+    codings = [None, *CODECS]
+
+    print(f"{'endpoint':<28} {'format':<8} {'coding':<9} {'bytes':>8} {'vs json':>8} {'encode µs':>10}")
+    for endpoint, content in cases:
+        baseline = len(render(content))
+        for name, media_type in formats:
+            for coding in codings:
+                def encode():
+                    body = render(content, media_type)
+                    return body if coding is None else compress_body(coding, body)
+
+                size = len(encode())
+                micros = timeit.timeit(encode, number=args.repeat) / args.repeat * 1e6
+                print(
+                    f"{endpoint:<28} {name:<8} {coding or 'identity':<9} {size:>8} "
+                    f"{size / baseline:>7.0%} {micros:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
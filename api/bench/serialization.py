@@ -0,0 +1,95 @@
+"""Compare the old and new response serialization paths without a database.
+
+Run from api/:  python -m bench.serialization [--rows N] [--repeat N]
+"""
+import argparse
+import json
+import timeit
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from responses import FastJSONResponse
+from schemas import RoutineOut, HistoryPage, HistoryEntry, SetDetail
+
+
+def _routine_tuples(n: int) -> list[tuple]:
+    return [
+        (i, "user_bench", f"Rutina {i}", "Fuerza", '["Anillas", "Barra"]',
+         '["Lun", "Mié", "Vie"]', "3 Oct 2026", None, None, 6)
+        for i in range(n)
+    ]
+
+
+_ROUTINE_LIST = TypeAdapter(list[RoutineOut])
+
+_ROUTINE_FIELDS = [
+    "id", "user_id", "title", "subtitle", "tags", "schedule_days",
+    "last_performed", "completion_rate", "streak", "exercises_count",
+]
+
+
+def old_routines(rows: list[tuple]) -> bytes:
+    # ORM object -> model_validate per row -> response_model validation -> JSONResponse
+    out = []
+    for row in rows:
+        obj = SimpleNamespace(**dict(zip(_ROUTINE_FIELDS, row)))
+        r = RoutineOut.model_validate(obj)
+        r.exercises_count = obj.exercises_count
+        out.append(r)
+    validated = _ROUTINE_LIST.validate_python(out, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def new_routines(rows: list[tuple]) -> bytes:
+    return FastJSONResponse([dict(zip(_ROUTINE_FIELDS, row)) for row in rows]).body
+
+
+def _history_rows(n: int) -> list[dict]:
+    return [
+        {
+            "sessionId": i,
+            "date": "3 Oct 2026",
+            "routineName": "Empuje",
+            "sets": [
+                {"weight": 10.0, "reps": 8, "rpe": 8.5, "nivelAnillas": None} for _ in range(5)
+            ],
+            "totalVolume": 400.0,
+        }
+        for i in range(n)
+    ]
+
+
+def old_history(entries: list[dict]) -> bytes:
+    models = [
+        HistoryEntry(**{**e, "sets": [SetDetail(**s) for s in e["sets"]]}) for e in entries
+    ]
+    page = HistoryPage.model_validate({"entries": models, "nextCursor": None})
+    return json.dumps(jsonable_encoder(page)).encode()
+
+
+def new_history(entries: list[dict]) -> bytes:
+    return FastJSONResponse({"entries": entries, "nextCursor": None}).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        ("routines", _routine_tuples(args.rows), old_routines, new_routines),
+        ("history", _history_rows(args.rows), old_history, new_history),
+    ]
+    print(f"{'payload':<10} {'old µs':>10} {'new µs':>10} {'speedup':>8}")
+    for name, data, old, new in cases:
+        assert json.loads(old(data)) == json.loads(new(data))
+        t_old = timeit.timeit(lambda: old(data), number=args.repeat) / args.repeat * 1e6
+        t_new = timeit.timeit(lambda: new(data), number=args.repeat) / args.repeat * 1e6
+        print(f"{name:<10} {t_old:>10.1f} {t_new:>10.1f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import asyncio
+import functools
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from responses import negotiate, render
+from versions import _matches
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional: only needed with HISTORY_CACHE_URL
+    redis = None
+
+# redis:// URL of a Redis-compatible server; unset keeps the cache in process
+HISTORY_CACHE_URL = os.getenv("HISTORY_CACHE_URL")
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "86400"))
+GENERATIONS_MAX = 100_000
+
+
+# ─── Backends ─────────────────────────────────────────────────────────────────
+# Both store rendered response bodies plus one generation token per user.
+# Entry keys embed the token, so invalidating a user is replacing it.
+
+class MemoryBackend:
+    """In-process LRU bounded by total body size.
+
+    Per worker: with several workers, each caches and invalidates on its
+    own, so a write is only seen by the worker that took it. Use the Redis
+    backend there.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        # Forgetting a token only orphans that user's entries, so this can be capped too
+        self._generations: OrderedDict[str, str] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    async def set(self, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def generation(self, user_id: str) -> str:
+        token = self._generations.get(user_id)
+        if token is None:
+            return await self.invalidate(user_id)
+        self._generations.move_to_end(user_id)
+        return token
+
+    async def invalidate(self, user_id: str) -> str:
+        token = self._generations[user_id] = uuid.uuid4().hex
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > GENERATIONS_MAX:
+            self._generations.popitem(last=False)
+        return token
+
+
+class RedisBackend:
+    """Shared across workers. Only GET and SET are used, so any
+    Redis-compatible server (or a local stand-in) works."""
+
+    def __init__(self, url: str, ttl: int):
+        if redis is None:
+            raise RuntimeError("HISTORY_CACHE_URL is set but the redis package is not installed")
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(f"calisheet:history:{key}")
+
+    async def set(self, key: str, body: bytes):
+        await self.client.set(f"calisheet:history:{key}", body, ex=self.ttl)
+
+    async def generation(self, user_id: str) -> str:
+        key = f"calisheet:generation:{user_id}"
+        token = await self.client.get(key)
+        if token is None:
+            # NX: concurrent first readers agree on one token
+            await self.client.set(key, uuid.uuid4().hex, nx=True, ex=self.ttl * 2)
+            token = await self.client.get(key)
+        return token.decode()
+
+    async def invalidate(self, user_id: str) -> str:
+        token = uuid.uuid4().hex
+        await self.client.set(f"calisheet:generation:{user_id}", token, ex=self.ttl * 2)
+        return token
+
+
+# ─── Result cache ─────────────────────────────────────────────────────────────
+
+class ResultCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def invalidate(self, user_id: str):
+        await self.backend.invalidate(user_id)
+
+    def cached(self, handler):
+        """Wrap a GET handler that takes `request` and `user_id` and
+        returns plain JSON-able content.
+
+        The body is cached per (user, generation, media type, path and
+        query) and the same key is the ETag, so neither a hit nor a 304
+        touches the database. Concurrent misses on one key share a single computation.
+        The undecorated handler stays reachable as `__wrapped__`.
+        """
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            user_id: str = kwargs["user_id"]
+            media_type = negotiate(request)
+            generation = await self.backend.generation(user_id)
+            raw = f"{user_id}:{generation}:{media_type}:{request.url.path}?{request.url.query}"
+            key = hashlib.sha256(raw.encode()).hexdigest()[:32]
+            headers = {"ETag": f'"{key}"', "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and _matches(if_none_match, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+
+            body = await self.backend.get(key)
+            if body is None:
+                body = await self._single_flight(key, lambda: handler(*args, **kwargs), media_type)
+            return Response(body, media_type=media_type, headers=headers)
+
+        return wrapper
+
+    async def _single_flight(self, key: str, compute, media_type: str) -> bytes:
+        while (pending := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The request computing it went away (client disconnected);
+                # the first waiter back computes it, unless one already has
+                body = await self.backend.get(key)
+                if body is not None:
+                    return body
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            body = render(await compute(), media_type)
+            await self.backend.set(key, body)
+            future.set_result(body)
+            return body
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved; there may be no waiters
+            raise
+        finally:
+            del self._inflight[key]
+
+
+history_cache = ResultCache(
+    RedisBackend(HISTORY_CACHE_URL, HISTORY_CACHE_TTL_SECONDS) if HISTORY_CACHE_URL
+    else MemoryBackend(HISTORY_CACHE_MAX_BYTES)
+)
@@ -0,0 +1,187 @@
+import unicodedata
+
+from fastapi import HTTPException
+from sqlalchemy import select, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from models import Exercise
+
+# Shared catalog every user sees, in the app's labels (constants/equipment.ts).
+# Adding an entry here takes a migration that calls seed_globals again.
+GLOBAL_EXERCISES = [
+    ("Dominadas", "Espalda", ["Barra"]),
+    ("Dominadas supinas", "Espalda", ["Barra"]),
+    ("Dominadas lastradas", "Espalda", ["Barra", "Lastre"]),
+    ("Muscle-up", "Espalda", ["Barra"]),
+    ("Muscle-up en anillas", "Espalda", ["Anillas"]),
+    ("Remo australiano", "Espalda", ["Barra"]),
+    ("Remo en anillas", "Espalda", ["Anillas"]),
+    ("Front lever", "Espalda", ["Barra", "Duración"]),
+    ("Fondos", "Pecho", ["Paralelas"]),
+    ("Fondos lastrados", "Pecho", ["Paralelas", "Lastre"]),
+    ("Fondos en anillas", "Pecho", ["Anillas"]),
+    ("Flexiones", "Pecho", []),
+    ("Flexiones diamante", "Tríceps", []),
+    ("Flexiones en anillas", "Pecho", ["Anillas"]),
+    ("Flexiones en pino", "Hombro", []),
+    ("Pino", "Hombro", ["Duración"]),
+    ("Press militar", "Hombro", ["1 Mancuerna"]),
+    ("Sentadillas", "Piernas", []),
+    ("Sentadilla búlgara", "Piernas", ["2 Mancuernas"]),
+    ("Pistol squat", "Piernas", []),
+    ("Zancadas", "Piernas", ["2 Mancuernas"]),
+    ("Elevaciones de piernas", "Core", ["Barra"]),
+    ("L-sit", "Core", ["Paralelas", "Duración"]),
+    ("Plancha", "Core", ["Duración"]),
+]
+
+
+def normalize(name: str) -> str:
+    """Catalog key for a name: case, accents and spacing don't matter."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def id_for(user_id: str, name: str):
+    """Scalar subquery for the catalog id a user's `name` refers to.
+
+    The user's own entry wins over a global one with the same key. An
+    unknown name yields NULL, which matches no rows.
+    """
+    return (
+        select(Exercise.id)
+        .where(
+            Exercise.key == normalize(name),
+            or_(Exercise.user_id == user_id, Exercise.user_id.is_(None)),
+        )
+        .order_by(Exercise.user_id.nulls_last())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def _lookup(db: AsyncSession, user_id: str, keys) -> dict[str, int]:
+    result = await db.execute(
+        select(Exercise.key, Exercise.id)
+        .where(
+            Exercise.key.in_(keys),
+            or_(Exercise.user_id == user_id, Exercise.user_id.is_(None)),
+        )
+        # Global rows first so the user's own entry overwrites them below
+        .order_by(Exercise.user_id.nulls_first())
+    )
+    return {key: exercise_id for key, exercise_id in result.all()}
+
+
+async def resolve(db: AsyncSession, user_id: str, names) -> dict[str, int]:
+    """Map names to catalog ids, adding user entries for unknown ones."""
+    keys = {name: normalize(name) for name in names}
+    if not keys:
+        return {}
+    found = await _lookup(db, user_id, set(keys.values()))
+    missing = {}
+    for name, key in keys.items():
+        if key not in found:
+            missing.setdefault(key, name)  # first spelling seen becomes the label
+    if missing:
+        await db.execute(
+            pg_insert(Exercise).on_conflict_do_nothing(
+                index_elements=["user_id", "key"], index_where=Exercise.user_id.is_not(None)
+            ),
+            [{"user_id": user_id, "name": name, "key": key} for key, name in missing.items()],
+        )
+        # Re-read rather than RETURNING: a concurrent request may have won the insert
+        found.update(await _lookup(db, user_id, missing))
+    return {name: found[key] for name, key in keys.items()}
+
+
+async def labels(db: AsyncSession, user_id: str, ids) -> dict[int, str]:
+    """Labels for catalog ids the user can see; 422 if any is not one."""
+    ids = set(ids)
+    if not ids:
+        return {}
+    result = await db.execute(
+        select(Exercise.id, Exercise.name)
+        .where(
+            Exercise.id.in_(ids),
+            or_(Exercise.user_id == user_id, Exercise.user_id.is_(None)),
+        )
+    )
+    found = dict(result.all())
+    if len(found) != len(ids):
+        raise HTTPException(status_code=422, detail="Unknown exercise id")
+    return found
+
+
+# ─── Migration ────────────────────────────────────────────────────────────────
+
+async def seed_globals(conn: AsyncConnection):
+    await conn.execute(
+        pg_insert(Exercise).on_conflict_do_nothing(
+            index_elements=["key"], index_where=Exercise.user_id.is_(None)
+        ),
+        [
+            {
+                "user_id": None,
+                "name": name,
+                "key": normalize(name),
+                "muscle": muscle,
+                "equipment": equipment,
+            }
+            for name, muscle, equipment in GLOBAL_EXERCISES
+        ],
+    )
+
+
+async def backfill(conn: AsyncConnection):
+    """Point existing sets and routine exercises at catalog entries."""
+    await seed_globals(conn)
+
+    has_names = (await conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'session_sets' AND column_name = 'exercise_name'"
+    ))).first() is not None
+    pairs = (
+        "SELECT r.user_id, e.name FROM routine_exercises e "
+        "JOIN routines r ON r.id = e.routine_id WHERE e.exercise_id IS NULL AND e.name <> ''"
+    )
+    if has_names:
+        pairs += (
+            " UNION SELECT w.user_id, s.exercise_name FROM session_sets s "
+            "JOIN workout_sessions w ON w.id = s.session_id WHERE s.exercise_id IS NULL"
+        )
+    by_user: dict[str, set[str]] = {}
+    for user_id, name in (await conn.execute(text(pairs))).all():
+        by_user.setdefault(user_id, set()).add(name)
+    if not by_user:
+        return
+
+    db = AsyncSession(bind=conn)
+    mapping = []
+    for user_id, user_names in by_user.items():
+        ids = await resolve(db, user_id, user_names)
+        mapping.extend({"u": user_id, "n": name, "e": ids[name]} for name in user_names)
+
+    await conn.execute(text(
+        "CREATE TEMPORARY TABLE exercise_name_map "
+        "(user_id VARCHAR, name VARCHAR, exercise_id INTEGER) ON COMMIT DROP"
+    ))
+    await conn.execute(
+        text("INSERT INTO exercise_name_map VALUES (:u, :n, :e)"), mapping
+    )
+    if has_names:
+        await conn.execute(text(
+            "UPDATE session_sets s SET exercise_id = m.exercise_id "
+            "FROM workout_sessions w, exercise_name_map m "
+            "WHERE w.id = s.session_id AND m.user_id = w.user_id AND m.name = s.exercise_name"
+        ))
+    # Re-stamp routine exercises so synced clients pick up the new key
+    await conn.execute(text(
+        "UPDATE routine_exercises e "
+        "SET exercise_id = m.exercise_id, change_seq = nextval('change_seq') "
+        "FROM routines r, exercise_name_map m "
+        "WHERE r.id = e.routine_id AND m.user_id = r.user_id AND m.name = e.name "
+        "AND e.exercise_id IS NULL"
+    ))
@@ -0,0 +1,160 @@
+import os
+import re
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from responses import accept_weights
+
+try:
+    import brotli
+except ImportError:  # optional: br is only offered when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is only offered when installed
+    zstandard = None
+
+# Below about one packet compression saves no round trip, only CPU
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Bodies this large are compressed off the event loop
+COMPRESSION_THREAD_BYTES = 128 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+# ─── Codecs ───────────────────────────────────────────────────────────────────
+# Each call compresses one chunk of the body; the last one (more_body=False)
+# ends the stream. Earlier chunks are flushed so a streamed body keeps moving.
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def __call__(self, body: bytes, more_body: bool) -> bytes:
+        flush = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(flush)
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def __call__(self, body: bytes, more_body: bool) -> bytes:
+        out = self._compressor.process(body)
+        return out + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def __call__(self, body: bytes, more_body: bool) -> bytes:
+        flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK if more_body else zstandard.COMPRESSOBJ_FLUSH_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(flush)
+
+
+# Server preference, best ratio first, for clients that accept several equally
+CODECS = {
+    coding: codec
+    for coding, codec, available in [
+        ("zstd", _Zstd, zstandard is not None),
+        ("br", _Brotli, brotli is not None),
+        ("gzip", _Gzip, True),
+    ]
+    if available
+}
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """The content coding to use for an Accept-Encoding header, or None."""
+    weights = accept_weights(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in CODECS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_body(coding: str, body: bytes) -> bytes:
+    """Compress a whole body in one go, as the middleware does for non-streamed ones."""
+    return CODECS[coding]()(body, False)
+
+
+# ─── Middleware ───────────────────────────────────────────────────────────────
+
+class _Responder(IdentityResponder):
+    """Starlette's gzip responder logic (size threshold, excluded types,
+    streaming) with whichever codec was negotiated."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int, coding: str):
+        super().__init__(app, minimum_size)
+        self.content_encoding = coding
+        self._codec = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._codec is None:
+            self._codec = CODECS[self.content_encoding]()
+        if len(body) >= COMPRESSION_THREAD_BYTES:
+            return await anyio.to_thread.run_sync(self._codec, body, more_body)
+        return self._codec(body, more_body)
+
+
+_ETAG_SUFFIX = re.compile(r'-(?:gzip|br|zstd)"')
+
+
+class CompressionMiddleware:
+    """Negotiated response compression.
+
+    A compressed body is a different representation, so it gets its own
+    strong ETag: the coding is appended inside the quotes. The suffix is
+    stripped from If-None-Match on the way in, so the ETag checks in the
+    app only ever see their own tags.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        coding = negotiate(headers.get("accept-encoding", ""))
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            scope = {
+                **scope,
+                "headers": [
+                    (name, _ETAG_SUFFIX.sub('"', value.decode("latin-1")).encode("latin-1"))
+                    if name == b"if-none-match" else (name, value)
+                    for name, value in scope["headers"]
+                ],
+            }
+
+        async def send_tagged(message: Message):
+            if message["type"] == "http.response.start" and coding is not None:
+                out = MutableHeaders(raw=message["headers"])
+                etag = out.get("etag")
+                if etag and etag.startswith('"'):
+                    tagged = f'{etag[:-1]}-{coding}"'
+                    revalidated = message["status"] == 304 and if_none_match and tagged in [
+                        tag.strip() for tag in if_none_match.split(",")
+                    ]
+                    if out.get("content-encoding") == coding or revalidated:
+                        out["ETag"] = tagged
+            await send(message)
+
+        if coding is None:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        else:
+            responder = _Responder(self.app, self.minimum_size, coding)
+        await responder(scope, receive, send_tagged)
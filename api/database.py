@@ -1,11 +1,121 @@
 import os
+import time
+from collections import OrderedDict
+from fastapi import Depends
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from auth import get_current_user_id
+from migrations import run_migrations, check_version
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://calisheet:secret@db/calisheet")
+# Optional streaming replica for read-only endpoints
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# How long after a write a user's reads stay on the primary
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# With several API replicas, set to 0 and run `python migrations.py upgrade`
+# as a deploy step; workers then only verify the schema version.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") == "1"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+
+# ─── Pool ─────────────────────────────────────────────────────────────────────
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that tracks waiters and how long checkouts take.
+
+    `checkouts` and the wait figures cover checkouts that got a connection;
+    ones that gave up after pool_timeout only count in `timeouts`. The wait
+    ends once the pool hands a connection over, so it includes opening a new
+    one but not the pre-ping that follows.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        # Same test QueuePool._do_get makes: only with no idle connection and
+        # no overflow left does a checkout block on the queue
+        queued = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+        )
+        if queued:
+            self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            if queued:
+                self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return connection
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep the counters accumulating
+        new = super().recreate()
+        for attr in ("checkouts", "timeouts", "wait_total", "wait_max"):
+            setattr(new, attr, getattr(self, attr))
+        return new
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "checkout_wait_seconds_total": round(self.wait_total, 6),
+            "checkout_wait_seconds_max": round(self.wait_max, 6),
+        }
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        # Recycle and pre-ping retire connections a DB restart has killed
+        # on checkout, instead of failing the first request on each one.
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "timeout": DB_CONNECT_TIMEOUT,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+engine = _create_engine(DATABASE_URL)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+read_engine = _create_engine(DATABASE_READ_URL) if DATABASE_READ_URL else engine
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
@@ -17,6 +127,61 @@ async def get_db() -> AsyncSession:
         yield session
 
 
-async def create_tables():
+# ─── Read routing ─────────────────────────────────────────────────────────────
+# Pins are per process. That covers a single uvicorn worker, and with
+# several workers it still covers the common case of the same connection
+# reading right after it wrote.
+
+# Kept in expiry order (every pin lasts the same window and moves to the
+# end), so expired pins are pruned from the front as new ones come in.
+_pinned_until: OrderedDict[str, float] = OrderedDict()
+
+
+def pin_to_primary(user_id: str):
+    if read_engine is not engine:
+        now = time.monotonic()
+        while _pinned_until and next(iter(_pinned_until.values())) <= now:
+            _pinned_until.popitem(last=False)
+        _pinned_until[user_id] = now + READ_YOUR_WRITES_SECONDS
+        _pinned_until.move_to_end(user_id)
+
+
+def _is_pinned(user_id: str) -> bool:
+    until = _pinned_until.get(user_id)
+    if until is None:
+        return False
+    if until <= time.monotonic():
+        del _pinned_until[user_id]
+        return False
+    return True
+
+
+def read_session_factory(user_id: str) -> async_sessionmaker:
+    return AsyncSessionLocal if _is_pinned(user_id) else ReadSessionLocal
+
+
+async def get_read_db(user_id: str = Depends(get_current_user_id)) -> AsyncSession:
+    async with read_session_factory(user_id)() as session:
+        yield session
+
+
+async def create_tables(migrate: bool = MIGRATE_ON_STARTUP):
     async with engine.begin() as conn:
+        if not migrate:
+            await check_version(conn)
+            return
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
+
+
+def pool_stats() -> dict[str, dict]:
+    stats = {"primary": engine.sync_engine.pool.stats()}
+    if read_engine is not engine:
+        stats["replica"] = read_engine.sync_engine.pool.stats()
+    return stats
+
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -1,19 +1,32 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import create_tables
-from routers import routines, history
+import metrics
+import outbox
+from compress import CompressionMiddleware
+from database import engine, read_engine, create_tables, dispose_engines, pool_stats
+from responses import FastJSONResponse
+from routers import routines, exercises, history, imports, sync, dashboard
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await create_tables()
+    outbox.worker.start()
     yield
+    await outbox.worker.stop()
+    await dispose_engines()
 
 
-app = FastAPI(title="CaliSheet API", lifespan=lifespan)
+app = FastAPI(title="CaliSheet API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
+metrics.instrument_engine(engine)
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,9 +35,23 @@ app.add_middleware(
 )
 
 app.include_router(routines.router)
+app.include_router(exercises.router)
 app.include_router(history.router)
+app.include_router(imports.router)
+app.include_router(sync.router)
+app.include_router(dashboard.router)
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/health/pool")
+async def health_pool():
+    return pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return metrics.render(pool_stats())
@@ -0,0 +1,182 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger("calisheet.metrics")
+
+# Requests issuing more queries than this get a warning; catches N+1 loops
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+# ─── Histograms ───────────────────────────────────────────────────────────────
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            # per-bucket counts, then sum and count
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route and status.",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_db_queries", "SQL statements issued per request.",
+    ("method", "route"), QUERY_BUCKETS,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+
+
+# ─── Per-request DB accounting ────────────────────────────────────────────────
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+def _record(context):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    del context._query_started
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    # The start time lives on the execution context, which ends with the
+    # statement: one that fails never reaches after_cursor_execute, so
+    # handle_error records it instead and nothing is left on the connection
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _record(context)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        _record(exception_context.execution_context)
+
+
+# ─── Middleware ───────────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # Route templates, not raw paths, to keep label cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            request_latency.observe(elapsed, method, path, str(status))
+            request_queries.observe(stats.queries, method, path)
+            request_db_time.observe(stats.db_time, method, path)
+            if stats.queries > QUERY_BUDGET:
+                logger.warning(
+                    "%s %s issued %d queries (budget %d, %.1f ms in DB)",
+                    method, path, stats.queries, QUERY_BUDGET, stats.db_time * 1000,
+                )
+
+
+# ─── Exposition ───────────────────────────────────────────────────────────────
+
+def render(pools: dict[str, dict]) -> str:
+    lines = []
+    for histogram in (request_latency, request_queries, request_db_time):
+        lines.extend(histogram.render())
+    gauges = {
+        "checked_out": "Connections currently checked out.",
+        "waiting": "Requests waiting for a connection.",
+        "overflow": "Connections open beyond pool_size.",
+    }
+    counters = {
+        "checkouts": "Connection checkouts.",
+        "timeouts": "Checkouts that timed out.",
+        "checkout_wait_seconds_total": "Time spent waiting for connections.",
+    }
+    for kind, metrics in (("gauge", gauges), ("counter", counters)):
+        for key, help in metrics.items():
+            name = f"db_pool_{key}"
+            if kind == "counter" and not name.endswith("_total"):
+                name += "_total"
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for pool, stats in pools.items():
+                lines.append(f'{name}{{pool="{pool}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
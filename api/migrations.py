@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+# ─── Migrations ───────────────────────────────────────────────────────────────
+# create_all only creates missing tables, so column and index changes on
+# existing tables go here. Each step must also be a no-op on a database that
+# create_all has just built from the current models. Steps are SQL strings,
+# or async callables for data changes that need Python.
+
+async def _backfill_exercise_ids(conn: AsyncConnection):
+    import catalog
+    await catalog.backfill(conn)
+
+
+async def _rekey_rollups(conn: AsyncConnection):
+    import rollups
+    await rollups.rekey(conn)
+
+
+async def _rebuild_rollups(conn: AsyncConnection):
+    import rollups
+    await rollups.rebuild(AsyncSession(bind=conn))
+
+
+def _text_to_array(table: str, *columns: str) -> str:
+    """Convert JSON string[] TEXT columns to TEXT[], unless already done."""
+    alters = ",\n".join(
+        f"ALTER COLUMN {c} DROP DEFAULT, "
+        f"ALTER COLUMN {c} TYPE TEXT[] USING pg_temp.json_text_array({c}), "
+        f"ALTER COLUMN {c} SET DEFAULT '{{}}', "
+        f"ALTER COLUMN {c} SET NOT NULL"
+        for c in columns
+    )
+    return f"""
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = '{table}' AND column_name = '{columns[0]}') = 'text' THEN
+                ALTER TABLE {table} {alters};
+            END IF;
+        END
+        $$
+        """
+
+
+MIGRATIONS: list[tuple[int, str, list]] = [
+    (1, "session idempotency keys", [
+        "ALTER TABLE workout_sessions ADD COLUMN IF NOT EXISTS client_id VARCHAR",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_workout_sessions_user_client "
+        "ON workout_sessions (user_id, client_id)",
+    ]),
+    (2, "typed session timestamps", [
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'workout_sessions' AND column_name = 'finished_at')
+               <> 'timestamp with time zone' THEN
+                -- started_at is NOT NULL, so a blank one takes finished_at
+                -- and, when both are blank, the epoch
+                ALTER TABLE workout_sessions
+                    ALTER COLUMN started_at TYPE TIMESTAMPTZ USING COALESCE(
+                        NULLIF(started_at, '')::timestamptz,
+                        NULLIF(finished_at, '')::timestamptz,
+                        'epoch'::timestamptz),
+                    ALTER COLUMN finished_at TYPE TIMESTAMPTZ
+                        USING NULLIF(finished_at, '')::timestamptz;
+            END IF;
+        END
+        $$
+        """,
+    ]),
+    (3, "history and foreign-key indexes", [
+        # Only on databases that still have exercise_name; step 5 replaces it
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'session_sets' AND column_name = 'exercise_name') THEN
+                CREATE INDEX IF NOT EXISTS ix_session_sets_exercise_session
+                    ON session_sets (exercise_name, session_id);
+            END IF;
+        END
+        $$
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_session_sets_session_id ON session_sets (session_id)",
+        "CREATE INDEX IF NOT EXISTS ix_workout_sessions_user_finished "
+        "ON workout_sessions (user_id, finished_at)",
+        "CREATE INDEX IF NOT EXISTS ix_routine_exercises_routine_id ON routine_exercises (routine_id)",
+        "CREATE INDEX IF NOT EXISTS ix_set_templates_exercise_id ON set_templates (exercise_id)",
+    ]),
+    (4, "sync change tracking", [
+        "CREATE SEQUENCE IF NOT EXISTS change_seq",
+        "ALTER TABLE routines "
+        "ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')",
+        "ALTER TABLE routine_exercises "
+        "ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')",
+        "ALTER TABLE set_templates "
+        "ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')",
+        "ALTER TABLE workout_sessions "
+        "ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')",
+        "CREATE INDEX IF NOT EXISTS ix_routines_user_change ON routines (user_id, change_seq)",
+        "CREATE INDEX IF NOT EXISTS ix_routine_exercises_change ON routine_exercises (change_seq)",
+        "CREATE INDEX IF NOT EXISTS ix_set_templates_change ON set_templates (change_seq)",
+        "CREATE INDEX IF NOT EXISTS ix_workout_sessions_user_change "
+        "ON workout_sessions (user_id, change_seq)",
+    ]),
+    (5, "exercise catalog keys", [
+        "ALTER TABLE session_sets ADD COLUMN IF NOT EXISTS exercise_id INTEGER REFERENCES exercises (id)",
+        "ALTER TABLE routine_exercises "
+        "ADD COLUMN IF NOT EXISTS exercise_id INTEGER REFERENCES exercises (id)",
+        _backfill_exercise_ids,
+        "ALTER TABLE session_sets ALTER COLUMN exercise_id SET NOT NULL",
+        # Also drops the old (exercise_name, session_id) index
+        "ALTER TABLE session_sets DROP COLUMN IF EXISTS exercise_name",
+        "CREATE INDEX IF NOT EXISTS ix_session_sets_exercise_session "
+        "ON session_sets (exercise_id, session_id)",
+        _rekey_rollups,
+    ]),
+    (6, "native array columns", [
+        # ALTER ... USING can't hold a subquery, so the JSON unpacking goes in a function
+        """
+        CREATE FUNCTION pg_temp.json_text_array(raw TEXT) RETURNS TEXT[]
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT coalesce(array_agg(e), '{}')
+            FROM jsonb_array_elements_text(coalesce(nullif(raw, ''), '[]')::jsonb) AS e
+        $$
+        """,
+        _text_to_array("routines", "tags", "schedule_days"),
+        _text_to_array("routine_exercises", "equipment"),
+        _text_to_array("exercises", "equipment"),
+        "DROP FUNCTION pg_temp.json_text_array(TEXT)",
+        "CREATE INDEX IF NOT EXISTS ix_routines_tags ON routines USING gin (tags)",
+        "CREATE INDEX IF NOT EXISTS ix_routines_schedule_days ON routines USING gin (schedule_days)",
+        "CREATE INDEX IF NOT EXISTS ix_routine_exercises_equipment "
+        "ON routine_exercises USING gin (equipment)",
+    ]),
+    # create_all added the rollup tables empty to databases that already had
+    # sessions; on a fresh one there are no sets, so this inserts nothing
+    (7, "backfill exercise rollups", [
+        _rebuild_rollups,
+    ]),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    exists = await conn.execute(text("SELECT to_regclass('schema_version')"))
+    if exists.scalar() is None:
+        return 0
+    result = await conn.execute(text("SELECT max(version) FROM schema_version"))
+    return result.scalar() or 0
+
+
+async def check_version(conn: AsyncConnection):
+    version = await current_version(conn)
+    if version != HEAD:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {HEAD}; "
+            "run `python migrations.py upgrade`"
+        )
+
+
+async def run_migrations(conn: AsyncConnection):
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+    # Serialize concurrent workers starting up against the same database
+    await conn.execute(text("LOCK TABLE schema_version IN EXCLUSIVE MODE"))
+    version = await current_version(conn)
+    for step, description, statements in MIGRATIONS:
+        if step <= version:
+            continue
+        for statement in statements:
+            if callable(statement):
+                await statement(conn)
+            else:
+                await conn.execute(text(statement))
+        await conn.execute(
+            text("INSERT INTO schema_version (version, description) VALUES (:v, :d)"),
+            {"v": step, "d": description},
+        )
+
+
+# ─── Plan checks ──────────────────────────────────────────────────────────────
+# Runs every /history handler against the live schema, captures the SQL it
+# issues and EXPLAINs each statement. `explain` does so with sequential scans
+# disabled: a Seq Scan that survives that on one of the large tables means no
+# index can serve the query. tests/test_plans.py checks the plans the planner
+# actually picks against a snapshot.
+
+LARGE_TABLES = {"session_sets", "workout_sessions"}
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+async def history_plans(conn: AsyncConnection, user_id: str, name: str) -> dict[str, list[dict]]:
+    """The EXPLAIN (FORMAT JSON) plan of each SELECT, by /history endpoint."""
+    from routers import history
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    # __wrapped__ skips the result cache, so every call reaches the database
+    calls = {
+        "exercises": lambda db: history.get_exercise_names.__wrapped__(
+            None, user_id=user_id, db=db
+        ),
+        "stats": lambda db: history.get_exercise_stats.__wrapped__(
+            None, "2000-01-01T00:00:00Z", name=name, user_id=user_id, db=db
+        ),
+        "sessions": lambda db: history.get_exercise_history.__wrapped__(
+            None, name=name, user_id=user_id, db=db
+        ),
+        "volume": lambda db: history.get_volume_progression.__wrapped__(
+            None, name=name, user_id=user_id, db=db
+        ),
+        "overview": lambda db: history.get_exercise_overview.__wrapped__(
+            None, "2000-01-01T00:00:00Z", name=name, user_id=user_id, db=db
+        ),
+    }
+
+    plans = {}
+    db = AsyncSession(bind=conn)
+    for endpoint, call in calls.items():
+        statements.clear()
+        event.listen(conn.sync_connection, "before_cursor_execute", capture)
+        try:
+            await call(db)
+        finally:
+            event.remove(conn.sync_connection, "before_cursor_execute", capture)
+        plans[endpoint] = []
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plans[endpoint].append(plan[0]["Plan"])
+    return plans
+
+
+async def explain_history(conn: AsyncConnection, user_id: str, name: str) -> bool:
+    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+    ok = True
+    for endpoint, plans in (await history_plans(conn, user_id, name)).items():
+        for plan in plans:
+            scans = _seq_scans(plan)
+            status = "OK" if not scans else f"SEQ SCAN on {', '.join(scans)}"
+            print(f"/history/{endpoint}: {status}")
+            ok = ok and not scans
+    return ok
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────────────
+
+async def _main(args) -> int:
+    import models  # noqa: F401  (registers tables on Base.metadata)
+    from database import engine, create_tables
+
+    try:
+        if args.command == "upgrade":
+            await create_tables(migrate=True)
+            print(f"Schema at version {HEAD}")
+        elif args.command == "current":
+            async with engine.connect() as conn:
+                print(f"Schema at version {await current_version(conn)} (head {HEAD})")
+        elif args.command == "explain":
+            async with engine.connect() as conn:
+                trans = await conn.begin()
+                try:
+                    ok = await explain_history(conn, args.user, args.name)
+                finally:
+                    await trans.rollback()
+            return 0 if ok else 1
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CaliSheet schema migrations")
+    parser.add_argument("command", choices=["upgrade", "current", "explain"])
+    parser.add_argument("--user", default="explain-check", help="user id for `explain`")
+    parser.add_argument("--name", default="Dominadas", help="exercise name for `explain`")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
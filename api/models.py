@@ -1,46 +1,83 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, func
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Float, Text, Date, DateTime,
+    ForeignKey, Index, Sequence, func, text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from database import Base
 
+# Monotonic change counter shared by every synced table. Each insert or
+# update stamps the row with the next value; GET /sync returns rows above
+# the client's last cursor.
+change_sequence = Sequence("change_seq", metadata=Base.metadata)
 
-class Routine(Base):
+
+class SyncTracked:
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+    change_seq = Column(
+        BigInteger, nullable=False,
+        server_default=change_sequence.next_value(), onupdate=change_sequence.next_value(),
+    )
+
+
+class Routine(SyncTracked, Base):
     __tablename__ = "routines"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, nullable=False, index=True)
     title = Column(String, nullable=False, default="")
     subtitle = Column(String, default="")
-    tags = Column(Text, default="[]")           # JSON string[]
-    schedule_days = Column(Text, default="[]")  # JSON string[]
+    tags = Column(ARRAY(Text), nullable=False, default=list, server_default="{}")
+    schedule_days = Column(ARRAY(Text), nullable=False, default=list, server_default="{}")
     last_performed = Column(String, default="Nunca")
     completion_rate = Column(Integer, nullable=True)
     streak = Column(String, nullable=True)
     created_at = Column(String, default=func.now())
 
-    exercises = relationship("RoutineExercise", back_populates="routine", cascade="all, delete-orphan")
+    exercises = relationship(
+        "RoutineExercise", back_populates="routine", cascade="all, delete-orphan",
+        order_by="RoutineExercise.sort_order",
+    )
     sessions = relationship("WorkoutSession", back_populates="routine")
 
+    __table_args__ = (
+        Index("ix_routines_user_change", "user_id", "change_seq"),
+        Index("ix_routines_tags", "tags", postgresql_using="gin"),
+        Index("ix_routines_schedule_days", "schedule_days", postgresql_using="gin"),
+    )
 
-class RoutineExercise(Base):
+
+class RoutineExercise(SyncTracked, Base):
     __tablename__ = "routine_exercises"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    routine_id = Column(Integer, ForeignKey("routines.id", ondelete="CASCADE"), nullable=False)
+    routine_id = Column(Integer, ForeignKey("routines.id", ondelete="CASCADE"), nullable=False, index=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=True)  # NULL while unnamed
     name = Column(String, nullable=False, default="")
     muscle = Column(String, default="")
-    equipment = Column(Text, default="[]")  # JSON string[]
+    equipment = Column(ARRAY(Text), nullable=False, default=list, server_default="{}")
     rest_seconds = Column(Integer, default=90)
     sort_order = Column(Integer, default=0)
 
     routine = relationship("Routine", back_populates="exercises")
-    set_templates = relationship("SetTemplate", back_populates="exercise", cascade="all, delete-orphan")
+    set_templates = relationship(
+        "SetTemplate", back_populates="exercise", cascade="all, delete-orphan",
+        order_by="SetTemplate.sort_order",
+    )
+
+    __table_args__ = (
+        Index("ix_routine_exercises_change", "change_seq"),
+        Index("ix_routine_exercises_equipment", "equipment", postgresql_using="gin"),
+    )
 
 
-class SetTemplate(Base):
+class SetTemplate(SyncTracked, Base):
     __tablename__ = "set_templates"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    exercise_id = Column(Integer, ForeignKey("routine_exercises.id", ondelete="CASCADE"), nullable=False)
+    exercise_id = Column(Integer, ForeignKey("routine_exercises.id", ondelete="CASCADE"), nullable=False, index=True)
     sets = Column(String, default="3")
     reps = Column(String, default="10")
     weight = Column(String, default="0")
@@ -49,31 +86,128 @@ class SetTemplate(Base):
 
     exercise = relationship("RoutineExercise", back_populates="set_templates")
 
+    __table_args__ = (
+        Index("ix_set_templates_change", "change_seq"),
+    )
 
-class WorkoutSession(Base):
+
+class WorkoutSession(SyncTracked, Base):
     __tablename__ = "workout_sessions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, nullable=False, index=True)
     routine_id = Column(Integer, ForeignKey("routines.id", ondelete="SET NULL"), nullable=True)
     routine_name = Column(String, nullable=False, default="")
-    started_at = Column(String, nullable=False)
-    finished_at = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
     total_volume_kg = Column(Float, default=0)
+    client_id = Column(String, nullable=True)  # client-generated idempotency key
 
     routine = relationship("Routine", back_populates="sessions")
     sets = relationship("SessionSet", back_populates="session", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_workout_sessions_user_client", "user_id", "client_id", unique=True),
+        Index("ix_workout_sessions_user_finished", "user_id", "finished_at"),
+        Index("ix_workout_sessions_user_change", "user_id", "change_seq"),
+    )
+
 
 class SessionSet(Base):
     __tablename__ = "session_sets"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    session_id = Column(Integer, ForeignKey("workout_sessions.id", ondelete="CASCADE"), nullable=False)
-    exercise_name = Column(String, nullable=False)
+    session_id = Column(Integer, ForeignKey("workout_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
     weight = Column(Float, default=0)
     reps = Column(Integer, default=0)
     rpe = Column(Float, nullable=True)
     nivel_anillas = Column(Integer, nullable=True)
 
     session = relationship("WorkoutSession", back_populates="sets")
+
+    __table_args__ = (
+        Index("ix_session_sets_exercise_session", "exercise_id", "session_id"),
+    )
+
+
+# ─── Catalog ──────────────────────────────────────────────────────────────────
+
+class Exercise(Base):
+    __tablename__ = "exercises"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=True)  # NULL for the global catalog
+    name = Column(String, nullable=False)
+    key = Column(String, nullable=False)     # catalog.normalize(name)
+    muscle = Column(String, default="")
+    equipment = Column(ARRAY(Text), nullable=False, default=list, server_default="{}")
+
+    __table_args__ = (
+        Index("ix_exercises_global_key", "key", unique=True, postgresql_where=text("user_id IS NULL")),
+        Index(
+            "ix_exercises_user_key", "user_id", "key",
+            unique=True, postgresql_where=text("user_id IS NOT NULL"),
+        ),
+    )
+
+
+# ─── Sync ─────────────────────────────────────────────────────────────────────
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    entity = Column(String, nullable=False)  # "routine" | "exercise" | "set_template"
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False, server_default=change_sequence.next_value())
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_change", "user_id", "change_seq"),
+    )
+
+
+class UserDataVersion(Base):
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)  # bumped from change_seq on every write
+
+
+# ─── Outbox ───────────────────────────────────────────────────────────────────
+# Written with each session and deleted once outbox.py has folded it into
+# the routine's derived fields, so only pending work lives here.
+
+class SessionEvent(Base):
+    __tablename__ = "session_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False, index=True)
+    session_id = Column(Integer, ForeignKey("workout_sessions.id", ondelete="CASCADE"), nullable=False)
+    routine_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# ─── Rollups ──────────────────────────────────────────────────────────────────
+# Derived from session_sets by rollups.py; safe to truncate and rebuild.
+
+class ExerciseDailyStats(Base):
+    __tablename__ = "exercise_daily_stats"
+
+    user_id = Column(String, primary_key=True)
+    exercise_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of finished_at
+    max_reps = Column(Integer, nullable=False, default=0)
+    max_weight = Column(Float, nullable=False, default=0)
+    session_count = Column(Integer, nullable=False, default=0)
+    total_volume = Column(Float, nullable=False, default=0)
+
+
+class ExerciseMonthlyVolume(Base):
+    __tablename__ = "exercise_monthly_volume"
+
+    user_id = Column(String, primary_key=True)
+    exercise_id = Column(Integer, primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the UTC month
+    volume = Column(Float, nullable=False, default=0)
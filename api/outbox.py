@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select, func, delete, update, distinct, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Routine, WorkoutSession, SessionEvent
+import versions
+
+logger = logging.getLogger("calisheet.outbox")
+
+OUTBOX_QUEUE_SIZE = int(os.getenv("OUTBOX_QUEUE_SIZE", "1000"))
+OUTBOX_BATCH_USERS = int(os.getenv("OUTBOX_BATCH_USERS", "50"))
+OUTBOX_BATCH_WINDOW_SECONDS = float(os.getenv("OUTBOX_BATCH_WINDOW_SECONDS", "0.05"))
+# Idle interval for picking up rows whose in-memory hint was dropped
+OUTBOX_SWEEP_SECONDS = float(os.getenv("OUTBOX_SWEEP_SECONDS", "30"))
+OUTBOX_SWEEP_LIMIT = 1000
+OUTBOX_DRAIN_SECONDS = float(os.getenv("OUTBOX_DRAIN_SECONDS", "10"))
+
+COMPLETION_WEEKS = 4
+STREAK_WEEKS = 52
+
+
+# ─── Write path ───────────────────────────────────────────────────────────────
+
+async def record(db: AsyncSession, user_id: str, sessions: list[tuple[int, int | None]]):
+    """Add (session id, routine id) events in the caller's transaction."""
+    if sessions:
+        await db.execute(pg_insert(SessionEvent), [
+            {"user_id": user_id, "session_id": session_id, "routine_id": routine_id}
+            for session_id, routine_id in sessions
+        ])
+
+
+# ─── Derived routine fields ───────────────────────────────────────────────────
+
+def _streak(weeks: set[date], today: date) -> int:
+    """Consecutive weeks with a session, counting back from this one."""
+    week = today - timedelta(days=today.weekday())
+    if week not in weeks:
+        week -= timedelta(weeks=1)  # this week may simply not be over yet
+    streak = 0
+    while week in weeks:
+        streak += 1
+        week -= timedelta(weeks=1)
+    return streak
+
+
+async def refresh_routines(db: AsyncSession, routine_ids: set[int]):
+    """Recompute last_performed, streak and completion_rate from sessions."""
+    now = datetime.now(timezone.utc)
+    finished_utc = func.timezone(literal_column("'UTC'"), WorkoutSession.finished_at)
+    week = func.date(func.date_trunc(literal_column("'week'"), finished_utc))
+    recent = WorkoutSession.finished_at >= now - timedelta(weeks=COMPLETION_WEEKS)
+    stats = {row.routine_id: row for row in (await db.execute(
+        select(
+            WorkoutSession.routine_id,
+            func.max(WorkoutSession.finished_at).label("last"),
+            func.count().filter(recent).label("recent"),
+            func.array_agg(distinct(week))
+            .filter(WorkoutSession.finished_at >= now - timedelta(weeks=STREAK_WEEKS))
+            .label("weeks"),
+        )
+        .where(WorkoutSession.routine_id.in_(routine_ids), WorkoutSession.finished_at.is_not(None))
+        .group_by(WorkoutSession.routine_id)
+    )).all()}
+    schedules = (await db.execute(
+        select(Routine.id, Routine.schedule_days).where(Routine.id.in_(routine_ids))
+    )).all()
+
+    values = []
+    for routine_id, schedule_days in schedules:
+        row = stats.get(routine_id)
+        planned = len(schedule_days) * COMPLETION_WEEKS
+        streak = _streak(set(row.weeks or ()), now.date()) if row else 0
+        values.append({
+            "id": routine_id,
+            "last_performed": row.last.strftime("%d %b %Y").lstrip("0") if row else "Nunca",
+            "streak": None if streak == 0 else f"{streak} {'semana' if streak == 1 else 'semanas'}",
+            "completion_rate": min(100, round(100 * row.recent / planned)) if row and planned else None,
+        })
+    if values:
+        # ORM bulk UPDATE by primary key: one executemany for the batch
+        await db.execute(update(Routine), values)
+
+
+# ─── Worker ───────────────────────────────────────────────────────────────────
+
+class OutboxWorker:
+    """Folds session events into routine fields off the request path.
+
+    The outbox row is the durable record; the queue only carries user ids
+    as wake-up hints. A hint that doesn't fit the queue, or a crash before
+    processing, leaves the row for the next sweep or startup replay.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def notify(self, user_id: str):
+        try:
+            self.queue.put_nowait(user_id)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), OUTBOX_DRAIN_SECONDS)
+        except TimeoutError:
+            logger.warning("Outbox drain timed out with %d users queued", self.queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        await self._safe_process(None)  # replay whatever the last process left
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), OUTBOX_SWEEP_SECONDS)
+            except TimeoutError:
+                await self._safe_process(None)
+                continue
+            # Let concurrent saves pile up, then take them as one batch
+            await asyncio.sleep(OUTBOX_BATCH_WINDOW_SECONDS)
+            users, taken = {first}, 1
+            while len(users) < OUTBOX_BATCH_USERS and not self.queue.empty():
+                users.add(self.queue.get_nowait())
+                taken += 1
+            await self._safe_process(users)
+            for _ in range(taken):
+                self.queue.task_done()
+
+    async def _safe_process(self, users: set[str] | None) -> int:
+        try:
+            return await process(users)
+        except Exception:
+            # Rows stay in the outbox and are retried by the next sweep
+            logger.exception("Outbox batch failed")
+            return 0
+
+
+async def process(users: set[str] | None = None, limit: int = OUTBOX_SWEEP_LIMIT) -> int:
+    """Apply pending events, for the given users or anyone's.
+
+    Events are claimed and committed `limit` at a time until a claim comes
+    back short, so a backlog drains in one call without one huge transaction.
+    """
+    total = 0
+    while True:
+        applied = await _process_batch(users, limit)
+        total += applied
+        if applied < limit:
+            return total
+
+
+async def _process_batch(users: set[str] | None, limit: int) -> int:
+    async with AsyncSessionLocal() as db:
+        query = (
+            select(SessionEvent.id, SessionEvent.user_id, SessionEvent.routine_id)
+            .order_by(SessionEvent.id)
+            .limit(limit)
+            # Other workers skip rows this one holds instead of redoing them
+            .with_for_update(skip_locked=True)
+        )
+        if users is not None:
+            query = query.where(SessionEvent.user_id.in_(users))
+        events = (await db.execute(query)).all()
+        if not events:
+            return 0
+        routine_ids = {e.routine_id for e in events if e.routine_id is not None}
+        owners = sorted({e.user_id for e in events if e.routine_id is not None})
+        for user_id in owners:
+            await versions.begin_write(db, user_id)
+        if routine_ids:
+            await refresh_routines(db, routine_ids)
+        await db.execute(delete(SessionEvent).where(SessionEvent.id.in_([e.id for e in events])))
+        # Routine rows changed, so their owners' cached reads are stale
+        for user_id in owners:
+            await versions.bump(db, user_id)
+        await db.commit()
+    return len(events)
+
+
+worker = OutboxWorker(OUTBOX_QUEUE_SIZE)
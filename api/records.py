@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Rep-max table covers 1RM..12RM; longer sets count towards the 12RM
+REP_MAX_RANGE = 12
+
+
+def estimate_1rm(weight: np.ndarray, reps: np.ndarray, formula: str) -> np.ndarray:
+    if formula == "brzycki":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Undefined from 37 reps on
+            estimate = np.where(reps < 37, weight * 36 / (37 - reps), np.nan)
+    else:
+        estimate = weight * (1 + reps / 30)
+    # A single is its own 1RM, whatever the formula says
+    return np.where(reps == 1, weight, estimate)
+
+
+def _argmax_by_group(values: np.ndarray, groups: np.ndarray, n: int) -> np.ndarray:
+    """Index of the largest value in each of `n` groups (every group non-empty)."""
+    order = np.lexsort((np.nan_to_num(values, nan=-np.inf), groups))
+    return order[np.cumsum(np.bincount(groups, minlength=n)) - 1]
+
+
+def _date(epoch: float) -> datetime:
+    return datetime.fromtimestamp(float(epoch), timezone.utc)
+
+
+def compute(rows, names: dict[int, str], formula: str = "epley") -> list[dict]:
+    """Personal records per exercise from (exercise_id, session_id,
+    finished epoch, weight, reps, nivel_anillas) rows sorted by exercise
+    and session.
+
+    The rows are transposed into arrays once and every aggregate is a
+    grouped numpy reduction, so cost grows with the number of sets only
+    through C loops.
+    """
+    if not rows:
+        return []
+    exercise, session, finished, weight, reps, level = zip(*rows)
+    exercise = np.array(exercise, dtype=np.int64)
+    session = np.array(session, dtype=np.int64)
+    finished = np.array(finished, dtype=float)
+    weight = np.nan_to_num(np.array(weight, dtype=float))
+    reps = np.nan_to_num(np.array(reps, dtype=float)).astype(np.int64)
+    level = np.array(level, dtype=float)  # NaN where not on rings
+
+    starts = np.flatnonzero(np.r_[True, exercise[1:] != exercise[:-1]])
+    n = starts.size
+    group = np.repeat(np.arange(n), np.diff(np.r_[starts, exercise.size]))
+
+    # Best set by estimated 1RM, among completed sets with external load; a
+    # 0-rep set still estimates its weight and would otherwise win
+    estimate = estimate_1rm(weight, reps, formula)
+    loaded = (weight > 0) & (reps >= 1)
+    best_set = _argmax_by_group(np.where(loaded, estimate, np.nan), group, n)
+    max_reps = np.maximum.reduceat(reps, starts)
+
+    # Heaviest weight moved for at least r reps
+    rep_max = np.full((n, REP_MAX_RANGE), -np.inf)
+    counted = reps >= 1
+    np.maximum.at(
+        rep_max, (group[counted], np.minimum(reps[counted], REP_MAX_RANGE) - 1), weight[counted]
+    )
+    rep_max = np.maximum.accumulate(rep_max[:, ::-1], axis=1)[:, ::-1]
+
+    # Per-session volume; rows of one session are contiguous
+    session_starts = np.flatnonzero(np.r_[
+        True, (exercise[1:] != exercise[:-1]) | (session[1:] != session[:-1])
+    ])
+    session_volume = np.add.reduceat(weight * reps, session_starts)
+    best_volume = _argmax_by_group(session_volume, group[session_starts], n)
+    best_session = session_starts[best_volume]
+
+    on_rings = ~np.isnan(level)
+    rings = _ring_levels(
+        group[on_rings], level[on_rings].astype(np.int64),
+        reps[on_rings], session[on_rings], finished[on_rings],
+    )
+
+    records = []
+    for g in range(n):
+        exercise_id = int(exercise[starts[g]])
+        b = best_set[g]
+        records.append({
+            "exerciseId": exercise_id,
+            "name": names.get(exercise_id, ""),
+            "bestSet": None if not loaded[b] or np.isnan(estimate[b]) else {
+                "weight": float(weight[b]),
+                "reps": int(reps[b]),
+                "estimated1RM": round(float(estimate[b]), 1),
+                "sessionId": int(session[b]),
+                "finishedAt": _date(finished[b]),
+            },
+            "maxReps": int(max_reps[g]),
+            "repMaxes": [None if np.isinf(w) else float(w) for w in rep_max[g]],
+            "bestSessionVolume": {
+                "volume": float(session_volume[best_volume[g]]),
+                "sessionId": int(session[best_session[g]]),
+                "finishedAt": _date(finished[best_session[g]]),
+            },
+            "ringLevels": rings.get(g, []),
+        })
+    return records
+
+
+def _ring_levels(group, level, reps, session, finished) -> dict[int, list[dict]]:
+    """Per exercise and ring level: best reps, amount of work and when it was done."""
+    if group.size == 0:
+        return {}
+    keys, inverse = np.unique(np.stack([group, level]), axis=1, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    k = keys.shape[1]
+    best = np.zeros(k, dtype=np.int64)
+    np.maximum.at(best, inverse, reps)
+    first = np.full(k, np.inf)
+    np.minimum.at(first, inverse, finished)
+    last = np.full(k, -np.inf)
+    np.maximum.at(last, inverse, finished)
+    sets = np.bincount(inverse, minlength=k)
+    sessions = np.bincount(np.unique(np.stack([inverse, session]), axis=1)[0], minlength=k)
+
+    out: dict[int, list[dict]] = {}
+    for i in range(k):  # keys come sorted by exercise group, then level
+        out.setdefault(int(keys[0, i]), []).append({
+            "level": int(keys[1, i]),
+            "maxReps": int(best[i]),
+            "sets": int(sets[i]),
+            "sessions": int(sessions[i]),
+            "firstAt": _date(first[i]),
+            "lastAt": _date(last[i]),
+        })
+    return out
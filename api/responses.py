@@ -0,0 +1,75 @@
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import ormsgpack
+except ImportError:  # optional: MessagePack is only offered when installed
+    ormsgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+def render(content: Any, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        # Datetimes become the same RFC 3339 strings as in the JSON body
+        return ormsgpack.packb(content, option=ormsgpack.OPT_NON_STR_KEYS | ormsgpack.OPT_UTC_Z)
+    # OPT_UTC_Z keeps UTC datetimes as "...Z", matching Pydantic's output
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+def accept_weights(header: str) -> dict[str, float]:
+    """q-values by lowercased token for an Accept or Accept-Encoding header."""
+    weights = {}
+    for item in header.split(","):
+        token, *params = (part.strip() for part in item.split(";"))
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[token.lower()] = q
+    return weights
+
+
+def negotiate(request: Request | None) -> str:
+    """MessagePack if the client opts in with Accept and it is installed, else JSON."""
+    if ormsgpack is None or request is None:
+        return JSON
+    weights = accept_weights(request.headers.get("accept", ""))
+    if max(weights.get(MSGPACK, 0), weights.get("application/x-msgpack", 0)) > 0:
+        return MSGPACK
+    return JSON
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return render(content)
+
+
+def json_response(
+    content: Any, response: Response | None = None, request: Request | None = None
+) -> Response:
+    """Render plain rows straight to JSON, skipping response_model validation.
+
+    Handlers that build their rows from SQL result tuples already produce
+    the declared shape, so validating them again is pure overhead. Pass the
+    injected `response` to keep headers set by dependencies (e.g. ETag), and
+    the `request` to answer `Accept: application/msgpack` with MessagePack.
+    """
+    media_type = negotiate(request)
+    out = Response(render(content, media_type), media_type=media_type)
+    if response is not None:
+        out.headers.update(response.headers)
+    if request is not None:
+        out.headers["Vary"] = "Accept"
+    return out
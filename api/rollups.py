@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+
+from sqlalchemy import select, func, distinct, delete, literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from database import AsyncSessionLocal, Base, create_tables
+from models import WorkoutSession, SessionSet, ExerciseDailyStats, ExerciseMonthlyVolume
+
+# Writers of one user's rollup rows take turns on this lock. A rebuild's
+# DELETE does not see rows another transaction inserts after it started, so
+# its plain INSERT would collide with them: with a second rebuild (two
+# imports), or with apply_sessions upserting a day or month the rebuild is
+# about to insert (POST /sessions committing during an import).
+REBUILD_LOCK_NAMESPACE = 0x524F4C4C  # advisory lock classid, "ROLL"
+
+
+async def _lock_user(db: AsyncSession, user_id: str):
+    await db.execute(select(
+        func.pg_advisory_xact_lock(REBUILD_LOCK_NAMESPACE, func.hashtext(user_id))
+    ))
+
+
+# ─── Expressions ──────────────────────────────────────────────────────────────
+
+_finished_utc = func.timezone(literal_column("'UTC'"), WorkoutSession.finished_at)
+finished_day = func.date(_finished_utc)
+finished_month = func.date(func.date_trunc(literal_column("'month'"), _finished_utc))
+
+_DAILY_COLUMNS = [
+    "user_id", "exercise_id", "day",
+    "max_reps", "max_weight", "session_count", "total_volume",
+]
+
+
+def _daily_select(*where):
+    return (
+        select(
+            WorkoutSession.user_id,
+            SessionSet.exercise_id,
+            finished_day,
+            func.coalesce(func.max(SessionSet.reps), 0),
+            func.coalesce(func.max(SessionSet.weight), 0),
+            func.count(distinct(SessionSet.session_id)),
+            func.coalesce(func.sum(SessionSet.weight * SessionSet.reps), 0),
+        )
+        .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
+        .where(WorkoutSession.finished_at.is_not(None), *where)
+        .group_by(WorkoutSession.user_id, SessionSet.exercise_id, finished_day)
+    )
+
+
+_MONTHLY_COLUMNS = ["user_id", "exercise_id", "month", "volume"]
+
+
+def _monthly_select(*where):
+    return (
+        select(
+            WorkoutSession.user_id,
+            SessionSet.exercise_id,
+            finished_month,
+            func.coalesce(func.sum(SessionSet.weight * SessionSet.reps), 0),
+        )
+        .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
+        .where(WorkoutSession.finished_at.is_not(None), *where)
+        .group_by(WorkoutSession.user_id, SessionSet.exercise_id, finished_month)
+    )
+
+
+# ─── Write path ───────────────────────────────────────────────────────────────
+
+async def apply_sessions(db: AsyncSession, user_id: str, session_ids: list[int]):
+    """Fold newly inserted sessions of one user into the daily and monthly rollups."""
+    if not session_ids:
+        return
+    await _lock_user(db, user_id)
+    stmt = pg_insert(ExerciseDailyStats).from_select(
+        _DAILY_COLUMNS, _daily_select(SessionSet.session_id.in_(session_ids))
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id", "day"],
+        set_={
+            "max_reps": func.greatest(ExerciseDailyStats.max_reps, stmt.excluded.max_reps),
+            "max_weight": func.greatest(ExerciseDailyStats.max_weight, stmt.excluded.max_weight),
+            # A session belongs to exactly one day, so counts are additive
+            "session_count": ExerciseDailyStats.session_count + stmt.excluded.session_count,
+            "total_volume": ExerciseDailyStats.total_volume + stmt.excluded.total_volume,
+        },
+    )
+    await db.execute(stmt)
+
+    stmt = pg_insert(ExerciseMonthlyVolume).from_select(
+        _MONTHLY_COLUMNS, _monthly_select(SessionSet.session_id.in_(session_ids))
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id", "month"],
+        set_={"volume": ExerciseMonthlyVolume.volume + stmt.excluded.volume},
+    )
+    await db.execute(stmt)
+
+
+async def rebuild(db: AsyncSession, user_id: str | None = None):
+    """Recompute the rollups from raw sets, for one user or everyone."""
+    where = [] if user_id is None else [WorkoutSession.user_id == user_id]
+    if user_id is not None:
+        await _lock_user(db, user_id)
+    for table, columns, source in (
+        (ExerciseDailyStats, _DAILY_COLUMNS, _daily_select),
+        (ExerciseMonthlyVolume, _MONTHLY_COLUMNS, _monthly_select),
+    ):
+        clear = delete(table)
+        if user_id is not None:
+            clear = clear.where(table.user_id == user_id)
+        await db.execute(clear)
+        await db.execute(pg_insert(table).from_select(columns, source(*where)))
+
+
+async def rekey(conn: AsyncConnection):
+    """Recreate rollups still keyed on exercise_name with catalog ids."""
+    old = (await conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'exercise_daily_stats' AND column_name = 'exercise_name'"
+    ))).first()
+    if old is None:
+        return
+    tables = [ExerciseDailyStats.__table__, ExerciseMonthlyVolume.__table__]
+    await conn.run_sync(lambda c: Base.metadata.drop_all(c, tables=tables))
+    await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=tables))
+    await rebuild(AsyncSession(bind=conn))
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────────────
+
+async def _main(args):
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        await rebuild(db, args.user)
+        await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild CaliSheet stats rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", help="only rebuild this user's rows")
+    asyncio.run(_main(parser.parse_args()))
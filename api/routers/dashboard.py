@@ -0,0 +1,89 @@
+import asyncio
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func
+
+from database import read_session_factory
+from models import WorkoutSession
+from schemas import DashboardOut
+from auth import get_current_user_id
+from responses import json_response
+from routers.history import _parse_since
+from routers.routines import _routine_list_query, _routine_list_row
+import versions
+
+router = APIRouter()
+
+# Labels the app stores in schedule_days
+DAYS = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+
+# ─── GET /dashboard?day=Lun&week_start=ISO ────────────────────────────────────
+
+@router.get("/dashboard", response_model=DashboardOut)
+async def get_dashboard(
+    day: str,
+    week_start: str,
+    request: Request,
+    response: Response,
+    recent: Annotated[int, Query(ge=1, le=20)] = 5,
+    user_id: str = Depends(get_current_user_id),
+):
+    # "Today" and "this week" are in the client's timezone, so it sends
+    # them; that also keeps them in the query string the ETag is keyed on.
+    if day not in DAYS:
+        raise HTTPException(status_code=422, detail="Invalid day")
+    week_start_dt = _parse_since(week_start)
+
+    factory = read_session_factory(user_id)
+    # The version check gets a session of its own, closed before the queries
+    # below fan out: a dependency's session would stay checked out alongside
+    # theirs for the whole request
+    async with factory() as db:
+        await versions.check_unchanged(db, request, response, user_id)
+
+    async def fetch(query):
+        # Each query gets its own session (and connection) so they run concurrently
+        async with factory() as db:
+            return (await db.execute(query)).all()
+
+    routines, sessions, week = await asyncio.gather(
+        fetch(_routine_list_query(user_id)),
+        fetch(
+            select(
+                WorkoutSession.id,
+                WorkoutSession.routine_id,
+                WorkoutSession.routine_name,
+                WorkoutSession.finished_at,
+                WorkoutSession.total_volume_kg,
+            )
+            .where(WorkoutSession.user_id == user_id, WorkoutSession.finished_at.is_not(None))
+            .order_by(WorkoutSession.finished_at.desc())
+            .limit(recent)
+        ),
+        fetch(
+            select(
+                func.coalesce(func.sum(WorkoutSession.total_volume_kg), 0),
+                func.count(WorkoutSession.id),
+            )
+            .where(WorkoutSession.user_id == user_id, WorkoutSession.finished_at >= week_start_dt)
+        ),
+    )
+
+    week_volume, week_sessions = week[0]
+    return json_response({
+        "routines": [_routine_list_row(r) for r in routines],
+        "todayRoutineIds": [r.id for r in routines if day in r.schedule_days],
+        "recentSessions": [
+            {
+                "id": s.id,
+                "routineId": s.routine_id,
+                "routineName": s.routine_name,
+                "finishedAt": s.finished_at,
+                "totalVolumeKg": s.total_volume_kg or 0,
+            }
+            for s in sessions
+        ],
+        "weekVolumeKg": week_volume,
+        "weekSessions": week_sessions,
+    }, response, request)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+
+from database import get_read_db
+from models import Exercise
+from schemas import CatalogExerciseOut
+from auth import get_current_user_id
+from routers.routines import _json_list
+
+router = APIRouter()
+
+
+# ─── GET /exercises ───────────────────────────────────────────────────────────
+
+@router.get("/exercises", response_model=list[CatalogExerciseOut])
+async def get_catalog(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # No ETag: global entries change with deploys, not with the user's data version
+    result = await db.execute(
+        select(Exercise)
+        .where(or_(Exercise.user_id == user_id, Exercise.user_id.is_(None)))
+        .order_by(Exercise.name)
+    )
+    return [
+        {
+            "id": ex.id,
+            "name": ex.name,
+            "muscle": ex.muscle,
+            "equipment": _json_list(ex.equipment),
+            "custom": ex.user_id is not None,
+        }
+        for ex in result.scalars().all()
+    ]
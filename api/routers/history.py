@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends
+import base64
+import csv
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Annotated, Literal, Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, distinct, cast
-from sqlalchemy.types import DateTime
+from sqlalchemy import select, func, distinct, or_, tuple_
 
-from database import get_db
-from models import WorkoutSession, SessionSet
-from schemas import ExerciseStats, HistoryEntry, VolumePoint, SetDetail
+from database import get_read_db, read_session_factory
+from models import Exercise, WorkoutSession, SessionSet, ExerciseDailyStats, ExerciseMonthlyVolume
+from schemas import ExerciseOverview, ExerciseRecords, ExerciseStats, HistoryPage, VolumePoint
 from auth import get_current_user_id
+from cache import history_cache
+import catalog
+import records
 
 router = APIRouter()
 
@@ -14,141 +23,401 @@ router = APIRouter()
 # ─── GET /history/exercises ───────────────────────────────────────────────────
 
 @router.get("/history/exercises", response_model=list[str])
+@history_cache.cached
 async def get_exercise_names(
+    request: Request,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
-        select(distinct(SessionSet.exercise_name))
+    # Postgres runs the EXISTS as a semi-join from the user's side: their
+    # sessions by user_id, their sets by session_id, de-duplicated to the
+    # exercise ids they've logged and hash-joined to the catalog. Only this
+    # user's sets are read; other users' history never is
+    used = (
+        select(SessionSet.id)
         .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
-        .where(WorkoutSession.user_id == user_id)
-        .order_by(SessionSet.exercise_name)
+        .where(SessionSet.exercise_id == Exercise.id, WorkoutSession.user_id == user_id)
+        .exists()
+    )
+    result = await db.execute(
+        select(Exercise.name)
+        .where(or_(Exercise.user_id == user_id, Exercise.user_id.is_(None)), used)
+        .order_by(Exercise.name)
     )
-    return [row[0] for row in result.all()]
+    return list(result.scalars().all())
 
 
-# ─── GET /history/stats?name=X&since=Y ───────────────────────────────────────
+# ─── GET /history/stats?name=X|exercise_id=N&since=Y ─────────────────────────
 
 @router.get("/history/stats", response_model=ExerciseStats)
+@history_cache.cached
 async def get_exercise_stats(
-    name: str,
+    request: Request,
     since: str,
+    name: Optional[str] = None,
+    exercise_id: Optional[int] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
+    return await _stats(db, user_id, _exercise(user_id, name, exercise_id), _parse_since(since))
+
+
+async def _stats(db: AsyncSession, user_id: str, exercise, since_dt: datetime) -> dict:
+    since_day = since_dt.astimezone(timezone.utc).date()
+
+    # Whole days after `since` come from the pre-summed rollup,
+    rollup = (await db.execute(
+        select(
+            func.max(ExerciseDailyStats.max_reps),
+            func.max(ExerciseDailyStats.max_weight),
+            func.sum(ExerciseDailyStats.session_count),
+            func.sum(ExerciseDailyStats.total_volume),
+        )
+        .where(
+            ExerciseDailyStats.user_id == user_id,
+            ExerciseDailyStats.exercise_id == exercise,
+            ExerciseDailyStats.day > since_day,
+        )
+    )).one()
+    # and only the partial first day is scanned from raw sets
+    partial = (await db.execute(
         select(
-            func.max(SessionSet.reps).label("max_reps"),
-            func.max(SessionSet.weight).label("max_weight"),
-            func.count(distinct(SessionSet.session_id)).label("total_sessions"),
-            func.sum(SessionSet.weight * SessionSet.reps).label("total_volume"),
+            func.max(SessionSet.reps),
+            func.max(SessionSet.weight),
+            func.count(distinct(SessionSet.session_id)),
+            func.sum(SessionSet.weight * SessionSet.reps),
         )
         .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
         .where(
-            SessionSet.exercise_name == name,
+            SessionSet.exercise_id == exercise,
             WorkoutSession.user_id == user_id,
-            WorkoutSession.finished_at >= since,
+            # The rest of since's UTC day, as a range ix_workout_sessions_user_finished serves
+            WorkoutSession.finished_at >= since_dt,
+            WorkoutSession.finished_at < datetime.combine(
+                since_day + timedelta(days=1), time.min, timezone.utc
+            ),
         )
-    )
-    row = result.one()
-    return ExerciseStats(
-        maxReps=row.max_reps or 0,
-        maxWeight=row.max_weight or 0,
-        totalSessions=row.total_sessions or 0,
-        totalVolume=row.total_volume or 0,
-    )
+    )).one()
+
+    return {
+        "maxReps": max(rollup[0] or 0, partial[0] or 0),
+        "maxWeight": max(rollup[1] or 0, partial[1] or 0),
+        "totalSessions": (rollup[2] or 0) + (partial[2] or 0),
+        "totalVolume": (rollup[3] or 0) + (partial[3] or 0),
+    }
+
+
+def _exercise(user_id: str, name: Optional[str], exercise_id: Optional[int]):
+    """Catalog id to filter on: the one given, or what `name` resolves to."""
+    if exercise_id is not None:
+        return exercise_id
+    if name is None:
+        raise HTTPException(status_code=422, detail="name or exercise_id is required")
+    return catalog.id_for(user_id, name)
 
 
-# ─── GET /history/sessions?name=X ────────────────────────────────────────────
+def _parse_since(since: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid since")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
 
-@router.get("/history/sessions", response_model=list[HistoryEntry])
+
+# ─── GET /history/sessions?name=X|exercise_id=N&cursor=C&limit=N ─────────────
+
+@router.get("/history/sessions", response_model=HistoryPage)
+@history_cache.cached
 async def get_exercise_history(
-    name: str,
+    request: Request,
+    name: Optional[str] = None,
+    exercise_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    sessions_result = await db.execute(
-        select(
-            SessionSet.session_id,
-            WorkoutSession.routine_name,
-            WorkoutSession.finished_at,
-        )
-        .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
+    return await _history_page(db, user_id, _exercise(user_id, name, exercise_id), cursor, limit)
+
+
+async def _history_page(
+    db: AsyncSession, user_id: str, exercise, cursor: Optional[str], limit: int
+) -> dict:
+    has_exercise = (
+        select(SessionSet.id)
+        .where(SessionSet.session_id == WorkoutSession.id, SessionSet.exercise_id == exercise)
+        .exists()
+    )
+    query = (
+        select(WorkoutSession.id, WorkoutSession.routine_name, WorkoutSession.finished_at)
         .where(
-            SessionSet.exercise_name == name,
             WorkoutSession.user_id == user_id,
+            WorkoutSession.finished_at.is_not(None),
+            has_exercise,
         )
-        .distinct()
-        .order_by(WorkoutSession.finished_at.desc())
-        .limit(20)
+        .order_by(WorkoutSession.finished_at.desc(), WorkoutSession.id.desc())
+        .limit(limit + 1)
     )
-    sessions = sessions_result.all()
+    if cursor is not None:
+        finished_at, session_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(WorkoutSession.finished_at, WorkoutSession.id) < tuple_(finished_at, session_id)
+        )
+    sessions = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = _encode_cursor(sessions[-1].finished_at, sessions[-1].id)
 
-    entries = []
-    for session_id, routine_name, finished_at in sessions:
+    # Sets for the whole page in one query, grouped in memory
+    sets_by_session: dict[int, list] = {session.id: [] for session in sessions}
+    if sessions:
         sets_result = await db.execute(
-            select(SessionSet)
+            select(
+                SessionSet.session_id,
+                SessionSet.weight,
+                SessionSet.reps,
+                SessionSet.rpe,
+                SessionSet.nivel_anillas,
+            )
             .where(
-                SessionSet.session_id == session_id,
-                SessionSet.exercise_name == name,
+                SessionSet.session_id.in_(sets_by_session),
+                SessionSet.exercise_id == exercise,
             )
-            .order_by(SessionSet.id)
+            .order_by(SessionSet.session_id, SessionSet.id)
         )
-        sets = sets_result.scalars().all()
-        total_volume = sum(s.weight * s.reps for s in sets)
-
-        from datetime import datetime
-        try:
-            date_str = datetime.fromisoformat(finished_at).strftime("%d %b %Y").lstrip("0")
-        except Exception:
-            date_str = finished_at
-
-        entries.append(HistoryEntry(
-            sessionId=session_id,
-            date=date_str,
-            routineName=routine_name,
-            sets=[SetDetail(
-                weight=s.weight,
-                reps=s.reps,
-                rpe=s.rpe,
-                nivelAnillas=s.nivel_anillas,
-            ) for s in sets],
-            totalVolume=total_volume,
-        ))
-    return entries
-
-
-# ─── GET /history/volume?name=X ───────────────────────────────────────────────
+        for row in sets_result.all():
+            sets_by_session[row.session_id].append(row)
+
+    entries = [
+        _history_entry(session_id, routine_name, finished_at, sets_by_session[session_id])
+        for session_id, routine_name, finished_at in sessions
+    ]
+    return {"entries": entries, "nextCursor": next_cursor}
+
+
+def _history_entry(session_id: int, routine_name: str, finished_at: datetime, sets) -> dict:
+    return {
+        "sessionId": session_id,
+        "date": finished_at.strftime("%d %b %Y").lstrip("0"),
+        "routineName": routine_name,
+        "sets": [
+            {"weight": s.weight, "reps": s.reps, "rpe": s.rpe, "nivelAnillas": s.nivel_anillas}
+            for s in sets
+        ],
+        "totalVolume": sum(s.weight * s.reps for s in sets),
+    }
+
+
+def _encode_cursor(finished_at: datetime, session_id: int) -> str:
+    raw = f"{finished_at.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        finished_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(finished_at), int(session_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+# ─── GET /history/volume?name=X|exercise_id=N ─────────────────────────────────
 
 @router.get("/history/volume", response_model=list[VolumePoint])
+@history_cache.cached
 async def get_volume_progression(
-    name: str,
+    request: Request,
+    name: Optional[str] = None,
+    exercise_id: Optional[int] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    finished_at_ts = cast(WorkoutSession.finished_at, DateTime)
-    month_label = func.to_char(finished_at_ts, "Mon")
-    month_key = func.to_char(finished_at_ts, "YYYY-MM")
+    return await _volume(db, user_id, _exercise(user_id, name, exercise_id))
+
+
+async def _volume(db: AsyncSession, user_id: str, exercise) -> list[dict]:
+    # Most recent 12 months, returned oldest first for the chart
     result = await db.execute(
-        select(
-            month_label.label("month"),
-            month_key.label("month_key"),
-            func.sum(SessionSet.weight * SessionSet.reps).label("volume"),
-        )
-        .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
+        select(ExerciseMonthlyVolume.month, ExerciseMonthlyVolume.volume)
         .where(
-            SessionSet.exercise_name == name,
-            WorkoutSession.user_id == user_id,
+            ExerciseMonthlyVolume.user_id == user_id,
+            ExerciseMonthlyVolume.exercise_id == exercise,
         )
-        .group_by(month_label, month_key)
-        .order_by(month_key)
+        .order_by(ExerciseMonthlyVolume.month.desc())
         .limit(12)
     )
-    return [
-        VolumePoint(
-            month=row.month,
-            volume=row.volume,
-            label=f"{round(row.volume)} kg",
+    return [_volume_point(month, volume) for month, volume in reversed(result.all())]
+
+
+def _volume_point(month: date, volume: float) -> dict:
+    return {"month": month.strftime("%b"), "volume": volume, "label": f"{round(volume)} kg"}
+
+
+# ─── GET /history/overview?name=X|exercise_id=N&since=Y ──────────────────────
+# Stats, first history page and volume series in one request. Each part runs
+# the bounded query its own endpoint does (rollups, a LIMITed page), so the
+# cost doesn't grow with the length of the exercise's history.
+
+@router.get("/history/overview", response_model=ExerciseOverview)
+@history_cache.cached
+async def get_exercise_overview(
+    request: Request,
+    since: str,
+    name: Optional[str] = None,
+    exercise_id: Optional[int] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    exercise = _exercise(user_id, name, exercise_id)
+    since_dt = _parse_since(since)
+    return {
+        "stats": await _stats(db, user_id, exercise, since_dt),
+        "history": await _history_page(db, user_id, exercise, None, limit),
+        "volume": await _volume(db, user_id, exercise),
+    }
+
+
+# ─── GET /history/records?formula=epley|brzycki ───────────────────────────────
+
+@router.get("/history/records", response_model=list[ExerciseRecords])
+@history_cache.cached
+async def get_personal_records(
+    request: Request,
+    formula: Literal["epley", "brzycki"] = "epley",
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # The whole set history in one pass, as plain tuples for records.compute
+    rows = (await db.execute(
+        select(
+            SessionSet.exercise_id,
+            SessionSet.session_id,
+            func.extract("epoch", WorkoutSession.finished_at),
+            SessionSet.weight,
+            SessionSet.reps,
+            SessionSet.nivel_anillas,
         )
-        for row in result.all()
-    ]
+        .join(WorkoutSession, WorkoutSession.id == SessionSet.session_id)
+        .where(WorkoutSession.user_id == user_id, WorkoutSession.finished_at.is_not(None))
+        .order_by(SessionSet.exercise_id, SessionSet.session_id)
+    )).all()
+    names = dict((await db.execute(
+        select(Exercise.id, Exercise.name).where(Exercise.id.in_({row[0] for row in rows}))
+    )).all()) if rows else {}
+    return records.compute(rows, names, formula)
+
+
+# ─── GET /history/export?format=csv|ndjson ────────────────────────────────────
+
+# One row per set; POST /import reads the same layout back
+EXPORT_COLUMNS = ["date", "started_at", "routine", "exercise", "weight", "reps", "rpe", "nivel_anillas"]
+EXPORT_BATCH = 1000
+
+
+@router.get("/history/export")
+async def export_history(
+    fmt: Annotated[Literal["csv", "ndjson"], Query(alias="format")] = "csv",
+    user_id: str = Depends(get_current_user_id),
+):
+    rows = _export_rows(user_id)
+    if fmt == "csv":
+        body, media_type = _csv_chunks(rows), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _ndjson_chunks(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="calisheet-history.{fmt}"'},
+    )
+
+
+async def _export_rows(user_id: str):
+    """Yield the user's sessions joined to their sets, one batch at a time.
+
+    The session is opened here rather than injected: the body is streamed
+    after the handler returns, and a server-side cursor keeps only one
+    batch in memory however long the history is.
+    """
+    query = (
+        select(
+            WorkoutSession.id,
+            WorkoutSession.routine_name,
+            WorkoutSession.started_at,
+            WorkoutSession.finished_at,
+            WorkoutSession.total_volume_kg,
+            Exercise.name.label("exercise"),
+            SessionSet.weight,
+            SessionSet.reps,
+            SessionSet.rpe,
+            SessionSet.nivel_anillas,
+        )
+        .outerjoin(SessionSet, SessionSet.session_id == WorkoutSession.id)
+        .outerjoin(Exercise, Exercise.id == SessionSet.exercise_id)
+        .where(WorkoutSession.user_id == user_id)
+        .order_by(WorkoutSession.started_at, WorkoutSession.id, SessionSet.id)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+    async with read_session_factory(user_id)() as db:
+        result = await db.stream(query)
+        async for batch in result.partitions():
+            yield batch
+
+
+async def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    async for batch in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            if row.exercise is None:
+                continue  # a session with no sets has no line of its own
+            writer.writerow([
+                row.finished_at.isoformat() if row.finished_at else "",
+                row.started_at.isoformat(),
+                row.routine_name,
+                row.exercise,
+                row.weight,
+                row.reps,
+                "" if row.rpe is None else row.rpe,
+                "" if row.nivel_anillas is None else row.nivel_anillas,
+            ])
+        yield buffer.getvalue()
+
+
+async def _ndjson_chunks(rows):
+    # One line per session; its sets may straddle two batches
+    current = None
+    async for batch in rows:
+        lines = []
+        for row in batch:
+            if current is None or current["id"] != row.id:
+                if current is not None:
+                    lines.append(orjson.dumps(current, option=orjson.OPT_UTC_Z))
+                current = {
+                    "id": row.id,
+                    "routineName": row.routine_name,
+                    "startedAt": row.started_at,
+                    "finishedAt": row.finished_at,
+                    "totalVolumeKg": row.total_volume_kg,
+                    "sets": [],
+                }
+            if row.exercise is not None:
+                current["sets"].append({
+                    "exerciseName": row.exercise,
+                    "weight": row.weight,
+                    "reps": row.reps,
+                    "rpe": row.rpe,
+                    "nivelAnillas": row.nivel_anillas,
+                })
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    if current is not None:
+        yield orjson.dumps(current, option=orjson.OPT_UTC_Z) + b"\n"
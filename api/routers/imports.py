@@ -0,0 +1,294 @@
+import codecs
+import csv
+import hashlib
+import math
+from datetime import datetime, timezone
+
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text, update, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from database import get_db
+from models import WorkoutSession, SessionSet
+from schemas import ImportReport
+from auth import get_current_user_id
+from routers.history import EXPORT_COLUMNS
+from cache import history_cache
+import catalog
+import rollups
+import versions
+
+router = APIRouter()
+
+IMPORT_BATCH = 5000
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = {"date", "exercise", "reps"}
+
+SESSION_COLUMNS = [
+    "id", "user_id", "routine_name", "started_at", "finished_at", "total_volume_kg", "client_id",
+]
+SET_COLUMNS = ["session_id", "exercise_id", "weight", "reps", "rpe", "nivel_anillas"]
+
+
+# ─── POST /import ─────────────────────────────────────────────────────────────
+# Body is the CSV itself (text/csv), in the layout GET /history/export writes:
+# one line per set, and lines sharing date and routine form one session.
+
+@router.post("/import", response_model=ImportReport)
+async def import_history(
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    await versions.begin_write(db, user_id)
+    batch = _ImportBatch(db, user_id)
+    header = None
+    async for records in _records(request.stream()):
+        for number, fields in records:
+            if header is None:
+                header = _header(fields)
+                continue
+            batch.add(number, dict(zip(header, fields)))
+        if len(batch.pending) >= IMPORT_BATCH:
+            await batch.flush()
+    if header is None:
+        raise HTTPException(status_code=422, detail="Empty file")
+    await batch.flush()
+
+    if batch.created:
+        await batch.finish()
+        await rollups.rebuild(db, user_id)
+        await versions.bump(db, user_id)
+    await db.commit()
+    if batch.created:
+        await history_cache.invalidate(user_id)
+    return batch.report()
+
+
+def _header(fields: list[str]) -> list[str]:
+    header = [f.strip().lower().replace(" ", "_") for f in fields]
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Missing columns: {', '.join(sorted(missing))} (expected {', '.join(EXPORT_COLUMNS)})",
+        )
+    return header
+
+
+async def _records(chunks):
+    """Yield the body's CSV records as lists of (record number, fields).
+
+    Bytes are decoded and split as they arrive. A line is held back only
+    while it is inside a quoted field, so a record is never cut in two.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    pending: list[str] = []
+    quotes = 0
+    delimiter = None
+    number = 0
+
+    def parse(lines):
+        nonlocal delimiter, number
+        if delimiter is None:
+            # Spreadsheets in comma-decimal locales export with semicolons
+            delimiter = ";" if lines[0].count(";") > lines[0].count(",") else ","
+        records = []
+        for fields in csv.reader(lines, delimiter=delimiter):
+            number += 1
+            if fields:
+                records.append((number, fields))
+        return records
+
+    def split(text_):
+        nonlocal tail, quotes
+        lines = (tail + text_).split("\n")
+        tail = lines.pop()
+        complete = []
+        for line in lines:
+            pending.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                complete.extend(pending)
+                pending.clear()
+                quotes = 0
+        return complete
+
+    async for chunk in chunks:
+        complete = split(decoder.decode(chunk))
+        if complete:
+            yield parse(complete)
+    rest = pending + [tail + decoder.decode(b"", final=True)]
+    if any(line.strip() for line in rest):
+        yield parse(rest)
+
+
+def _session_key(finished: datetime, routine: str) -> str:
+    # Deterministic idempotency key, so importing the same file twice is a no-op
+    raw = f"{finished.astimezone(timezone.utc).isoformat()}|{routine}"
+    return "import:" + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _parse_row(row: dict) -> tuple:
+    exercise = (row.get("exercise") or "").strip()
+    if not exercise:
+        raise ValueError("exercise is required")
+    finished = _timestamp(row.get("date"), "date")
+    started = _timestamp(row["started_at"], "started_at") if row.get("started_at") else finished
+    return (
+        finished,
+        started,
+        (row.get("routine") or "").strip(),
+        exercise,
+        _number(row.get("weight"), float, "weight", 0.0),
+        _number(row.get("reps"), int, "reps"),
+        _number(row.get("rpe"), float, "rpe", None),
+        _number(row.get("nivel_anillas"), int, "nivel_anillas", None),
+    )
+
+
+def _timestamp(value, column: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat((value or "").strip())
+    except ValueError:
+        raise ValueError(f"{column} is not an ISO date")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+_REQUIRED = object()
+
+
+def _number(value, kind, column: str, default=_REQUIRED):
+    value = (value or "").strip()
+    if not value:
+        if default is _REQUIRED:
+            raise ValueError(f"{column} is required")
+        return default
+    try:
+        number = float(value.replace(",", "."))  # decimal commas from es locales
+    except ValueError:
+        raise ValueError(f"{column} is not a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{column} is not a number")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"{column} is not a whole number")
+        number = int(number)
+    if number < 0:
+        raise ValueError(f"{column} is negative")
+    return number
+
+
+class _ImportBatch:
+    """Validated rows waiting to be COPYed, plus the running report."""
+
+    def __init__(self, db: AsyncSession, user_id: str):
+        self.db = db
+        self.user_id = user_id
+        self.pending: list[tuple] = []
+        self.rows = 0
+        self.sets = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: list[dict] = []
+        self.exercise_ids: dict[str, int] = {}
+        # idempotency key -> session id, or None for sessions imported before
+        self.sessions: dict[str, int | None] = {}
+
+    @property
+    def created(self) -> list[int]:
+        return [session_id for session_id in self.sessions.values() if session_id is not None]
+
+    def add(self, number: int, row: dict):
+        self.rows += 1
+        try:
+            self.pending.append(_parse_row(row))
+        except ValueError as e:
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"row": number, "error": str(e)})
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        names = {row[3] for row in batch} - self.exercise_ids.keys()
+        if names:
+            self.exercise_ids.update(await catalog.resolve(self.db, self.user_id, names))
+
+        new_sessions: dict[str, tuple] = {}
+        for row in batch:
+            key = _session_key(row[0], row[2])
+            if key not in self.sessions:
+                new_sessions.setdefault(key, row)
+        if new_sessions:
+            existing = set((await self.db.execute(
+                select(WorkoutSession.client_id)
+                .where(WorkoutSession.user_id == self.user_id, WorkoutSession.client_id.in_(new_sessions))
+            )).scalars())
+            self.sessions.update(dict.fromkeys(existing))
+            self.duplicates += len(existing)
+            fresh = [key for key in new_sessions if key not in existing]
+            if fresh:
+                # COPY can't RETURNING, so take the ids up front
+                ids = (await self.db.execute(
+                    text("SELECT nextval(pg_get_serial_sequence('workout_sessions', 'id')) "
+                         "FROM generate_series(1, :n)"),
+                    {"n": len(fresh)},
+                )).scalars().all()
+                records = []
+                for key, session_id in zip(fresh, ids):
+                    finished, started, routine = new_sessions[key][:3]
+                    self.sessions[key] = session_id
+                    records.append((session_id, self.user_id, routine, started, finished, 0.0, key))
+                await self._copy("workout_sessions", SESSION_COLUMNS, records)
+
+        records = []
+        for finished, _, routine, exercise, weight, reps, rpe, nivel in batch:
+            session_id = self.sessions[_session_key(finished, routine)]
+            if session_id is not None:
+                records.append((session_id, self.exercise_ids[exercise], weight, reps, rpe, nivel))
+        await self._copy("session_sets", SET_COLUMNS, records)
+        self.sets += len(records)
+
+    async def _copy(self, table: str, columns: list[str], records: list[tuple]):
+        if not records:
+            return
+        # COPY through the session's own connection, inside its transaction
+        conn = await self.db.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        try:
+            await raw.copy_records_to_table(table, records=records, columns=columns)
+        except asyncpg.UniqueViolationError:
+            raise HTTPException(status_code=409, detail="Another import of this file is in progress")
+
+    async def finish(self):
+        # A session's sets can span batches, so totals are summed once at the end
+        created = bindparam("created", self.created, type_=ARRAY(Integer))
+        totals = (
+            select(SessionSet.session_id, func.sum(SessionSet.weight * SessionSet.reps).label("volume"))
+            .where(SessionSet.session_id == any_(created))
+            .group_by(SessionSet.session_id)
+            .subquery()
+        )
+        await self.db.execute(
+            update(WorkoutSession)
+            .where(WorkoutSession.id == totals.c.session_id)
+            .values(total_volume_kg=totals.c.volume)
+        )
+
+    def report(self) -> dict:
+        return {
+            "rows": self.rows,
+            "sessionsCreated": len(self.created),
+            "duplicateSessions": self.duplicates,
+            "setsCreated": self.sets,
+            "errorCount": self.error_count,
+            "errors": self.errors,
+        }
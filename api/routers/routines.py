@@ -1,80 +1,123 @@
 import json
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+import uuid
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
 
-from database import get_db
-from models import Routine, RoutineExercise, SetTemplate, WorkoutSession, SessionSet
+from database import get_db, get_read_db
+from models import Routine, RoutineExercise, SetTemplate, WorkoutSession, SessionSet, SyncTombstone
 from schemas import (
     SaveRoutineRequest, RoutineOut, RoutineWithExercisesOut,
-    ExerciseOut, SetTemplateOut, SaveSessionRequest,
+    SaveSessionRequest, BulkSessionRequest, BulkSessionResult,
 )
 from auth import get_current_user_id
+from responses import json_response
+from cache import history_cache
+import catalog
+import outbox
+import rollups
+import versions
 
 router = APIRouter()
 
 
-# ─── GET /routines ────────────────────────────────────────────────────────────
+# ─── GET /routines?day=D&tag=T&equipment=E&limit=N&offset=N ──────────────────
 
-@router.get("/routines", response_model=list[RoutineOut])
+@router.get(
+    "/routines",
+    response_model=list[RoutineOut],
+    dependencies=[Depends(versions.conditional_get)],
+)
 async def get_routines(
+    request: Request,
+    response: Response,
+    day: Optional[str] = None,
+    tag: Optional[str] = None,
+    equipment: Optional[str] = None,
+    limit: Annotated[Optional[int], Query(ge=1, le=200)] = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
+    # Each filter is an array containment test the GIN indexes can answer
+    query = _routine_list_query(user_id)
+    if day is not None:
+        query = query.where(Routine.schedule_days.contains([day]))
+    if tag is not None:
+        query = query.where(Routine.tags.contains([tag]))
+    if equipment is not None:
+        query = query.where(
+            select(RoutineExercise.id)
+            .where(
+                RoutineExercise.routine_id == Routine.id,
+                RoutineExercise.equipment.contains([equipment]),
+            )
+            .correlate(Routine)  # the list query joins routine_exercises too
+            .exists()
+        )
+    result = await db.execute(query.limit(limit).offset(offset))
+    return json_response([_routine_list_row(row) for row in result.all()], response, request)
+
+
+def _routine_list_query(user_id: str):
+    return (
         select(
-            Routine,
+            Routine.id,
+            Routine.user_id,
+            Routine.title,
+            Routine.subtitle,
+            Routine.tags,
+            Routine.schedule_days,
+            Routine.last_performed,
+            Routine.completion_rate,
+            Routine.streak,
             func.count(RoutineExercise.id).label("exercises_count"),
         )
         .outerjoin(RoutineExercise, RoutineExercise.routine_id == Routine.id)
         .where(Routine.user_id == user_id)
         .group_by(Routine.id)
-        .order_by(Routine.created_at.desc())
+        .order_by(Routine.created_at.desc(), Routine.id.desc())
     )
-    rows = result.all()
-    out = []
-    for routine, count in rows:
-        r = RoutineOut.model_validate(routine)
-        r.exercises_count = count
-        out.append(r)
-    return out
+
+
+def _routine_list_row(row) -> dict:
+    return {
+        **row._asdict(),
+        "tags": _json_list(row.tags),
+        "schedule_days": _json_list(row.schedule_days),
+    }
 
 
 # ─── GET /routines/{id} ───────────────────────────────────────────────────────
 
-@router.get("/routines/{routine_id}", response_model=RoutineWithExercisesOut)
+@router.get(
+    "/routines/{routine_id}",
+    response_model=RoutineWithExercisesOut,
+    dependencies=[Depends(versions.conditional_get)],
+)
 async def get_routine_with_exercises(
     routine_id: int,
+    request: Request,
+    response: Response,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    routine = await db.get(Routine, routine_id)
-    if not routine or routine.user_id != user_id:
-        raise HTTPException(status_code=404, detail="Routine not found")
-
-    ex_result = await db.execute(
-        select(RoutineExercise)
-        .where(RoutineExercise.routine_id == routine_id)
-        .order_by(RoutineExercise.sort_order)
+    result = await db.execute(
+        select(Routine)
+        .where(Routine.id == routine_id, Routine.user_id == user_id)
+        .options(selectinload(Routine.exercises).selectinload(RoutineExercise.set_templates))
     )
-    exercises = ex_result.scalars().all()
-
-    exercises_out = []
-    for ex in exercises:
-        st_result = await db.execute(
-            select(SetTemplate)
-            .where(SetTemplate.exercise_id == ex.id)
-            .order_by(SetTemplate.sort_order)
-        )
-        set_templates = st_result.scalars().all()
-        ex_out = ExerciseOut.model_validate(ex)
-        ex_out.rows = [SetTemplateOut.model_validate(st) for st in set_templates]
-        exercises_out.append(ex_out)
+    routine = result.scalar_one_or_none()
+    if routine is None:
+        raise HTTPException(status_code=404, detail="Routine not found")
 
-    routine_out = RoutineOut.model_validate(routine)
-    routine_out.exercises_count = len(exercises)
-    return RoutineWithExercisesOut(routine=routine_out, exercises=exercises_out)
+    return json_response({
+        "routine": _routine_row(routine, len(routine.exercises)),
+        "exercises": [_exercise_row(ex) for ex in routine.exercises],
+    }, response, request)
 
 
 # ─── POST /routines ───────────────────────────────────────────────────────────
@@ -89,12 +132,14 @@ async def create_routine(
         user_id=user_id,
         title=data.title,
         subtitle=data.subtitle,
-        tags=json.dumps(data.tags),
-        schedule_days=json.dumps(data.scheduleDays),
+        tags=data.tags,
+        schedule_days=data.scheduleDays,
     )
+    await versions.begin_write(db, user_id)
     db.add(routine)
     await db.flush()
-    await _save_exercises(db, routine.id, data.exercises)
+    await _save_exercises(db, user_id, routine.id, data.exercises)
+    await versions.bump(db, user_id)
     await db.commit()
     return {"id": routine.id}
 
@@ -108,20 +153,27 @@ async def update_routine(
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    routine = await db.get(Routine, routine_id)
-    if not routine or routine.user_id != user_id:
+    await versions.begin_write(db, user_id)
+    result = await db.execute(
+        select(Routine)
+        .where(Routine.id == routine_id, Routine.user_id == user_id)
+        .options(selectinload(Routine.exercises).selectinload(RoutineExercise.set_templates))
+    )
+    routine = result.scalar_one_or_none()
+    if routine is None:
         raise HTTPException(status_code=404, detail="Routine not found")
 
-    routine.title = data.title
-    routine.subtitle = data.subtitle
-    routine.tags = json.dumps(data.tags)
-    routine.schedule_days = json.dumps(data.scheduleDays)
-
-    # Delete and re-insert exercises
-    await db.execute(
-        delete(RoutineExercise).where(RoutineExercise.routine_id == routine_id)
+    changed = _assign(
+        routine,
+        title=data.title,
+        subtitle=data.subtitle,
+        tags=data.tags,
+        schedule_days=data.scheduleDays,
     )
-    await _save_exercises(db, routine_id, data.exercises)
+    if await _save_exercises(db, user_id, routine_id, data.exercises, routine.exercises):
+        changed = True
+    if changed:
+        await versions.bump(db, user_id)
     await db.commit()
     return {"id": routine_id}
 
@@ -134,10 +186,22 @@ async def delete_routine(
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
+    await versions.begin_write(db, user_id)
     routine = await db.get(Routine, routine_id)
     if not routine or routine.user_id != user_id:
         raise HTTPException(status_code=404, detail="Routine not found")
+    # Detach the routine's sessions in one statement that also bumps their
+    # change_seq, so /sync sends them again with no routine; left to the
+    # ORM, the delete would load every one of them to null the key
+    await db.execute(
+        update(WorkoutSession)
+        .where(WorkoutSession.user_id == user_id, WorkoutSession.routine_id == routine_id)
+        .values(routine_id=None)
+        .execution_options(synchronize_session=False)
+    )
     await db.delete(routine)
+    await _record_deletions(db, user_id, "routine", [routine_id])
+    await versions.bump(db, user_id)
     await db.commit()
 
 
@@ -149,57 +213,307 @@ async def save_session(
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    session = WorkoutSession(
-        user_id=user_id,
-        routine_id=data.routineId,
-        routine_name=data.routineName,
-        started_at=data.startedAt,
-        finished_at=data.finishedAt,
-        total_volume_kg=data.totalVolumeKg,
-    )
-    db.add(session)
-    await db.flush()
+    results = await _insert_sessions(db, user_id, [data])
+    await db.commit()
+    await history_cache.invalidate(user_id)
+    outbox.worker.notify(user_id)
+    return {"id": results[0]["id"]}
+
 
-    for s in data.sets:
-        db.add(SessionSet(
-            session_id=session.id,
-            exercise_name=s.exerciseName,
-            weight=s.weight,
-            reps=s.reps,
-            rpe=s.rpe,
-            nivel_anillas=s.nivelAnillas,
-        ))
-
-    # Update last_performed on the routine
-    routine = await db.get(Routine, data.routineId)
-    if routine and routine.user_id == user_id:
-        now = datetime.now().strftime("%d %b %Y").lstrip("0")
-        routine.last_performed = now
+# ─── POST /sessions/bulk ──────────────────────────────────────────────────────
 
+@router.post("/sessions/bulk", response_model=list[BulkSessionResult])
+async def save_sessions_bulk(
+    data: BulkSessionRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    results = await _insert_sessions(db, user_id, data.sessions)
     await db.commit()
-    return {"id": session.id}
+    await history_cache.invalidate(user_id)
+    outbox.worker.notify(user_id)
+    return results
 
 
 # ─── Helper ───────────────────────────────────────────────────────────────────
 
-async def _save_exercises(db: AsyncSession, routine_id: int, exercises):
-    for i, ex in enumerate(exercises):
-        exercise = RoutineExercise(
-            routine_id=routine_id,
-            name=ex.name,
+async def _save_exercises(db: AsyncSession, user_id: str, routine_id: int, exercises, stored=()) -> bool:
+    """Bring the stored exercise tree in line with the request.
+
+    Exercises and set rows are matched by the id the client sends back, or
+    by position when it sends none: matched rows are updated only where a
+    field differs, new ones go in with batched INSERTs and unmatched stored
+    ones are deleted. Returns whether anything changed.
+    """
+    keys = await _catalog_keys(db, user_id, exercises)
+    changed = False
+    new_exercises = []
+    new_rows = []
+    stale_templates = []
+    matched_exercises = _match(exercises, stored)
+    for i, (ex, current) in enumerate(zip(exercises, matched_exercises)):
+        if current is None:
+            new_exercises.append(i)
+            continue
+        changed |= _assign(
+            current,
+            exercise_id=keys[i][0],
+            name=keys[i][1],
             muscle=ex.muscle,
-            equipment=json.dumps(ex.equipment),
+            equipment=ex.equipment,
             rest_seconds=ex.rest_seconds,
             sort_order=i,
         )
-        db.add(exercise)
-        await db.flush()
-        for j, row in enumerate(ex.rows):
-            db.add(SetTemplate(
-                exercise_id=exercise.id,
-                sets=row.sets,
-                reps=row.reps,
-                weight=row.weight,
-                nivel_anillas=row.nivel,
-                sort_order=j,
-            ))
+        templates = current.set_templates
+        matched_rows = _match(ex.rows, templates)
+        for j, (row, template) in enumerate(zip(ex.rows, matched_rows)):
+            if template is not None:
+                changed |= _assign(
+                    template,
+                    sets=row.sets,
+                    reps=row.reps,
+                    weight=row.weight,
+                    nivel_anillas=row.nivel,
+                    sort_order=j,
+                )
+            else:
+                new_rows.append(_set_template_values(current.id, j, row))
+        stale_templates.extend(_unmatched(templates, matched_rows))
+    stale_exercises = _unmatched(stored, matched_exercises)
+
+    if new_exercises:
+        result = await db.execute(
+            insert(RoutineExercise).returning(RoutineExercise.id, sort_by_parameter_order=True),
+            [
+                {
+                    "routine_id": routine_id,
+                    "exercise_id": keys[i][0],
+                    "name": keys[i][1],
+                    "muscle": exercises[i].muscle,
+                    "equipment": exercises[i].equipment,
+                    "rest_seconds": exercises[i].rest_seconds,
+                    "sort_order": i,
+                }
+                for i in new_exercises
+            ],
+        )
+        for i, exercise_id in zip(new_exercises, result.scalars().all()):
+            new_rows.extend(
+                _set_template_values(exercise_id, j, row) for j, row in enumerate(exercises[i].rows)
+            )
+    if new_rows:
+        await db.execute(insert(SetTemplate), new_rows)
+
+    if stale_templates:
+        await db.execute(delete(SetTemplate).where(SetTemplate.id.in_(stale_templates)))
+        await _record_deletions(db, user_id, "set_template", stale_templates)
+    if stale_exercises:
+        await db.execute(delete(RoutineExercise).where(RoutineExercise.id.in_(stale_exercises)))
+        await _record_deletions(db, user_id, "exercise", stale_exercises)
+
+    return changed or bool(new_exercises or new_rows or stale_templates or stale_exercises)
+
+
+def _match(items, stored) -> list:
+    """The stored row each incoming item updates, or None for a new one.
+
+    An item that carries an id gets the stored row with that id; one sent
+    without an id falls back to the stored row at its position, unless
+    another item claimed that row by id. Ids the routine doesn't have (say,
+    rows deleted on another device) insert afresh.
+    """
+    by_id = {row.id: row for row in stored}
+    claimed = {item.id for item in items if item.id in by_id}
+    matched = []
+    for i, item in enumerate(items):
+        if item.id is not None:
+            row = by_id.pop(item.id, None)
+        elif i < len(stored) and stored[i].id not in claimed:
+            row = by_id.pop(stored[i].id, None)
+        else:
+            row = None
+        matched.append(row)
+    return matched
+
+
+def _unmatched(stored, matched) -> list[int]:
+    kept = {row.id for row in matched if row is not None}
+    return [row.id for row in stored if row.id not in kept]
+
+
+async def _catalog_keys(db: AsyncSession, user_id: str, exercises) -> list[tuple]:
+    """(catalog id, name) per exercise; an id sent without a name takes the catalog's."""
+    given = await catalog.labels(
+        db, user_id, [ex.exercise_id for ex in exercises if ex.exercise_id is not None]
+    )
+    # Blank names are exercises still being filled in, so stay off the catalog
+    named = await catalog.resolve(
+        db, user_id, {ex.name for ex in exercises if ex.exercise_id is None and ex.name}
+    )
+    return [
+        (ex.exercise_id, ex.name or given[ex.exercise_id]) if ex.exercise_id is not None
+        else (named.get(ex.name), ex.name)
+        for ex in exercises
+    ]
+
+
+def _set_template_values(exercise_id: int, sort_order: int, row) -> dict:
+    return {
+        "exercise_id": exercise_id,
+        "sets": row.sets,
+        "reps": row.reps,
+        "weight": row.weight,
+        "nivel_anillas": row.nivel,
+        "sort_order": sort_order,
+    }
+
+
+def _assign(obj, **values) -> bool:
+    """Set only the attributes that differ, so unchanged rows emit no UPDATE."""
+    changed = False
+    for attr, value in values.items():
+        if getattr(obj, attr) != value:
+            setattr(obj, attr, value)
+            changed = True
+    return changed
+
+
+async def _record_deletions(db: AsyncSession, user_id: str, entity: str, ids):
+    if ids:
+        await db.execute(
+            insert(SyncTombstone),
+            [{"user_id": user_id, "entity": entity, "entity_id": i} for i in ids],
+        )
+
+
+async def _insert_sessions(db: AsyncSession, user_id: str, items) -> list[dict]:
+    """Insert sessions and their sets with batched multi-row INSERTs.
+
+    Items carry a clientId idempotency key; replays of a key the user has
+    already stored are reported as duplicates and not inserted again.
+    """
+    if not items:
+        return []  # an empty executemany would INSERT a row of defaults
+    await versions.begin_write(db, user_id)
+    keys = [item.clientId or uuid.uuid4().hex for item in items]
+
+    # Resolve exercises before writing anything, so an unknown id rejects the batch
+    await catalog.labels(
+        db, user_id, {s.exerciseId for item in items for s in item.sets if s.exerciseId is not None}
+    )
+    exercise_ids = await catalog.resolve(
+        db, user_id, {s.exerciseName for item in items for s in item.sets if s.exerciseId is None}
+    )
+
+    # Sessions may point at routines deleted while the client was offline
+    requested = {item.routineId for item in items}
+    owned = set((await db.execute(
+        select(Routine.id).where(Routine.id.in_(requested), Routine.user_id == user_id)
+    )).scalars())
+
+    inserted = await db.execute(
+        pg_insert(WorkoutSession)
+        .on_conflict_do_nothing(index_elements=["user_id", "client_id"])
+        .returning(WorkoutSession.id, WorkoutSession.client_id),
+        [
+            {
+                "user_id": user_id,
+                "client_id": key,
+                "routine_id": item.routineId if item.routineId in owned else None,
+                "routine_name": item.routineName,
+                "started_at": item.startedAt,
+                "finished_at": item.finishedAt,
+                "total_volume_kg": item.totalVolumeKg,
+            }
+            for key, item in zip(keys, items)
+        ],
+    )
+    created = {client_id: session_id for session_id, client_id in inserted.all()}
+
+    existing = {}
+    missing = set(keys) - created.keys()
+    if missing:
+        existing = dict((await db.execute(
+            select(WorkoutSession.client_id, WorkoutSession.id)
+            .where(WorkoutSession.user_id == user_id, WorkoutSession.client_id.in_(missing))
+        )).all())
+
+    results = []
+    set_rows = []
+    for key, item in zip(keys, items):
+        # A key repeated inside the same batch is only created once
+        session_id = created.pop(key, None)
+        if session_id is None:
+            results.append({"clientId": key, "id": existing[key], "status": "duplicate"})
+            continue
+        existing[key] = session_id
+        results.append({"clientId": key, "id": session_id, "status": "created"})
+        set_rows.extend(
+            {
+                "session_id": session_id,
+                "exercise_id": s.exerciseId if s.exerciseId is not None else exercise_ids[s.exerciseName],
+                "weight": s.weight,
+                "reps": s.reps,
+                "rpe": s.rpe,
+                "nivel_anillas": s.nivelAnillas,
+            }
+            for s in item.sets
+        )
+
+    if set_rows:
+        await db.execute(insert(SessionSet), set_rows)
+    created_ids = [r["id"] for r in results if r["status"] == "created"]
+    if created_ids:
+        await rollups.apply_sessions(db, user_id, created_ids)
+        await versions.bump(db, user_id)
+
+    # Routine fields derived from sessions are updated by the outbox worker
+    await outbox.record(db, user_id, [
+        (r["id"], item.routineId if item.routineId in owned else None)
+        for r, item in zip(results, items)
+        if r["status"] == "created"
+    ])
+    return results
+
+
+def _routine_row(routine: Routine, exercises_count: int) -> dict:
+    return {
+        "id": routine.id,
+        "user_id": routine.user_id,
+        "title": routine.title,
+        "subtitle": routine.subtitle,
+        "tags": _json_list(routine.tags),
+        "schedule_days": _json_list(routine.schedule_days),
+        "last_performed": routine.last_performed,
+        "completion_rate": routine.completion_rate,
+        "streak": routine.streak,
+        "exercises_count": exercises_count,
+    }
+
+
+def _exercise_row(ex: RoutineExercise) -> dict:
+    return {
+        "id": ex.id,
+        "routine_id": ex.routine_id,
+        "exercise_id": ex.exercise_id,
+        "name": ex.name,
+        "muscle": ex.muscle,
+        "equipment": _json_list(ex.equipment),
+        "rest_seconds": ex.rest_seconds,
+        "sort_order": ex.sort_order,
+        "rows": [
+            {
+                "id": st.id,
+                "sets": st.sets,
+                "reps": st.reps,
+                "weight": st.weight,
+                "nivel_anillas": st.nivel_anillas,
+            }
+            for st in ex.set_templates
+        ],
+    }
+
+
+def _json_list(values) -> str:
+    # Arrays go out as the JSON strings clients have always parsed
+    return json.dumps(values or [])
@@ -0,0 +1,149 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text
+
+from database import get_db
+from models import (
+    Exercise, Routine, RoutineExercise, SetTemplate, WorkoutSession, SessionSet, SyncTombstone,
+)
+from schemas import SyncResponse
+from auth import get_current_user_id
+from routers.routines import _routine_row, _json_list
+import versions
+
+router = APIRouter()
+
+
+# ─── GET /sync?since=C ────────────────────────────────────────────────────────
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    since: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 500,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    # Fix the upper bound first: rows stamped while we read are left for
+    # the next call instead of being skipped by a cursor past them. Writers
+    # still holding numbers below it are waited out first, and committing
+    # releases the lock before the reads. This stays on the primary: a
+    # replica's sequence state runs ahead of the values actually handed out.
+    await versions.wait_for_writes(db, user_id)
+    high = (await db.execute(
+        text("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM change_seq")
+    )).scalar()
+    await db.commit()
+
+    def window(column):
+        return column > since, column <= high
+
+    routines = (await db.execute(
+        select(Routine, func.count(RoutineExercise.id))
+        .outerjoin(RoutineExercise, RoutineExercise.routine_id == Routine.id)
+        .where(Routine.user_id == user_id, *window(Routine.change_seq))
+        .group_by(Routine.id)
+    )).all()
+
+    exercises = (await db.execute(
+        select(RoutineExercise)
+        .join(Routine, Routine.id == RoutineExercise.routine_id)
+        .where(Routine.user_id == user_id, *window(RoutineExercise.change_seq))
+    )).scalars().all()
+
+    set_templates = (await db.execute(
+        select(SetTemplate)
+        .join(RoutineExercise, RoutineExercise.id == SetTemplate.exercise_id)
+        .join(Routine, Routine.id == RoutineExercise.routine_id)
+        .where(Routine.user_id == user_id, *window(SetTemplate.change_seq))
+    )).scalars().all()
+
+    # Sessions are the only unbounded collection, so they are paged
+    sessions = (await db.execute(
+        select(WorkoutSession)
+        .where(WorkoutSession.user_id == user_id, *window(WorkoutSession.change_seq))
+        .order_by(WorkoutSession.change_seq)
+        .limit(limit + 1)
+    )).scalars().all()
+    cursor = high
+    has_more = len(sessions) > limit
+    if has_more:
+        sessions = sessions[:limit]
+        cursor = sessions[-1].change_seq
+
+    sets_by_session: dict[int, list] = {s.id: [] for s in sessions}
+    if sessions:
+        sets_result = await db.execute(
+            select(
+                SessionSet.session_id,
+                SessionSet.exercise_id,
+                Exercise.name.label("exercise_name"),
+                SessionSet.weight,
+                SessionSet.reps,
+                SessionSet.rpe,
+                SessionSet.nivel_anillas,
+            )
+            .join(Exercise, Exercise.id == SessionSet.exercise_id)
+            .where(SessionSet.session_id.in_(sets_by_session))
+            .order_by(SessionSet.session_id, SessionSet.id)
+        )
+        for row in sets_result.all():
+            sets_by_session[row.session_id].append({
+                "exerciseId": row.exercise_id,
+                "exerciseName": row.exercise_name,
+                "weight": row.weight,
+                "reps": row.reps,
+                "rpe": row.rpe,
+                "nivelAnillas": row.nivel_anillas,
+            })
+
+    deleted = (await db.execute(
+        select(SyncTombstone.entity, SyncTombstone.entity_id)
+        .where(SyncTombstone.user_id == user_id, *window(SyncTombstone.change_seq))
+        .order_by(SyncTombstone.change_seq)
+    )).all()
+
+    return {
+        "cursor": cursor,
+        "hasMore": has_more,
+        "routines": [_routine_row(routine, count) for routine, count in routines],
+        "exercises": [
+            {
+                "id": ex.id,
+                "routine_id": ex.routine_id,
+                "exercise_id": ex.exercise_id,
+                "name": ex.name,
+                "muscle": ex.muscle,
+                "equipment": _json_list(ex.equipment),
+                "rest_seconds": ex.rest_seconds,
+                "sort_order": ex.sort_order,
+            }
+            for ex in exercises
+        ],
+        "setTemplates": [
+            {
+                "id": st.id,
+                "exercise_id": st.exercise_id,
+                "sets": st.sets,
+                "reps": st.reps,
+                "weight": st.weight,
+                "nivel_anillas": st.nivel_anillas,
+                "sort_order": st.sort_order,
+            }
+            for st in set_templates
+        ],
+        "sessions": [
+            {
+                "id": s.id,
+                "routineId": s.routine_id,
+                "routineName": s.routine_name,
+                "startedAt": s.started_at,
+                "finishedAt": s.finished_at,
+                "totalVolumeKg": s.total_volume_kg,
+                "clientId": s.client_id,
+                "sets": sets_by_session[s.id],
+            }
+            for s in sessions
+        ],
+        "deleted": [{"entity": entity, "id": entity_id} for entity, entity_id in deleted],
+    }
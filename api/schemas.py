@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
+from datetime import datetime
 
 
 # ─── Set Templates ────────────────────────────────────────────────────────────
 
 class SetTemplateSchema(BaseModel):
+    id: Optional[int] = None  # stored row to update; matched by position without one
     sets: str = "3"
     reps: str = "10"
     weight: str = "0"
@@ -14,6 +16,8 @@ class SetTemplateSchema(BaseModel):
 # ─── Exercises ────────────────────────────────────────────────────────────────
 
 class ExerciseSchema(BaseModel):
+    id: Optional[int] = None  # stored routine exercise to update; matched by position without one
+    exercise_id: Optional[int] = None  # catalog id; otherwise resolved from name
     name: str = ""
     muscle: str = ""
     equipment: list[str] = []
@@ -35,6 +39,7 @@ class SetTemplateOut(BaseModel):
 class ExerciseOut(BaseModel):
     id: int
     routine_id: int
+    exercise_id: Optional[int] = None
     name: str
     muscle: str
     equipment: str  # JSON string
@@ -46,6 +51,16 @@ class ExerciseOut(BaseModel):
         from_attributes = True
 
 
+# ─── Exercise catalog ─────────────────────────────────────────────────────────
+
+class CatalogExerciseOut(BaseModel):
+    id: int
+    name: str
+    muscle: str
+    equipment: str  # JSON string
+    custom: bool    # the user's own entry rather than a global one
+
+
 # ─── Routines ─────────────────────────────────────────────────────────────────
 
 class SaveRoutineRequest(BaseModel):
@@ -78,23 +93,79 @@ class RoutineWithExercisesOut(BaseModel):
     exercises: list[ExerciseOut] = []
 
 
+# ─── Dashboard ────────────────────────────────────────────────────────────────
+
+class RecentSession(BaseModel):
+    id: int
+    routineId: Optional[int]
+    routineName: str
+    finishedAt: Optional[datetime]
+    totalVolumeKg: float
+
+
+class DashboardOut(BaseModel):
+    routines: list[RoutineOut]
+    todayRoutineIds: list[int]  # subset of routines scheduled for `day`
+    recentSessions: list[RecentSession]
+    weekVolumeKg: float
+    weekSessions: int
+
+
 # ─── Sessions ─────────────────────────────────────────────────────────────────
 
 class SessionSetInput(BaseModel):
-    exerciseName: str
+    exerciseId: Optional[int] = None
+    exerciseName: Optional[str] = None
     weight: float
     reps: int
     rpe: Optional[float] = None
     nivelAnillas: Optional[int] = None
 
+    @model_validator(mode="after")
+    def _needs_exercise(self):
+        if self.exerciseId is None and self.exerciseName is None:
+            raise ValueError("exerciseId or exerciseName is required")
+        return self
+
 
 class SaveSessionRequest(BaseModel):
     routineId: int
     routineName: str
-    startedAt: str
-    finishedAt: str
+    startedAt: datetime
+    finishedAt: datetime
     totalVolumeKg: float
     sets: list[SessionSetInput]
+    clientId: Optional[str] = None
+
+
+class BulkSessionItem(SaveSessionRequest):
+    clientId: str
+
+
+class BulkSessionRequest(BaseModel):
+    sessions: list[BulkSessionItem] = Field(max_length=500)
+
+
+class BulkSessionResult(BaseModel):
+    clientId: str
+    id: int
+    status: str  # "created" | "duplicate"
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+
+class ImportRowError(BaseModel):
+    row: int  # CSV record number, header = 1
+    error: str
+
+
+class ImportReport(BaseModel):
+    rows: int
+    sessionsCreated: int
+    duplicateSessions: int  # already imported by an earlier upload
+    setsCreated: int
+    errorCount: int
+    errors: list[ImportRowError]  # the first MAX_REPORTED_ERRORS of them
 
 
 # ─── History ──────────────────────────────────────────────────────────────────
@@ -121,7 +192,84 @@ class HistoryEntry(BaseModel):
     totalVolume: float
 
 
+class HistoryPage(BaseModel):
+    entries: list[HistoryEntry]
+    nextCursor: Optional[str] = None
+
+
 class VolumePoint(BaseModel):
     month: str
     volume: float
     label: str
+
+
+class ExerciseOverview(BaseModel):
+    stats: ExerciseStats
+    history: HistoryPage
+    volume: list[VolumePoint]
+
+
+class BestSet(BaseModel):
+    weight: float
+    reps: int
+    estimated1RM: float
+    sessionId: int
+    finishedAt: datetime
+
+
+class BestSessionVolume(BaseModel):
+    volume: float
+    sessionId: int
+    finishedAt: datetime
+
+
+class RingLevelProgress(BaseModel):
+    level: int
+    maxReps: int
+    sets: int
+    sessions: int
+    firstAt: datetime
+    lastAt: datetime
+
+
+class ExerciseRecords(BaseModel):
+    exerciseId: int
+    name: str
+    bestSet: Optional[BestSet]  # None when no set carried external load
+    maxReps: int
+    repMaxes: list[Optional[float]]  # index i is the best weight for i + 1 reps
+    bestSessionVolume: BestSessionVolume
+    ringLevels: list[RingLevelProgress]
+
+
+# ─── Sync ─────────────────────────────────────────────────────────────────────
+
+class SyncSetTemplate(SetTemplateOut):
+    exercise_id: int
+    sort_order: int
+
+
+class SyncSession(BaseModel):
+    id: int
+    routineId: Optional[int]
+    routineName: str
+    startedAt: datetime
+    finishedAt: Optional[datetime]
+    totalVolumeKg: float
+    clientId: Optional[str]
+    sets: list[SessionSetInput]
+
+
+class SyncDeletion(BaseModel):
+    entity: str  # "routine" | "exercise" | "set_template"; children go with their parent
+    id: int
+
+
+class SyncResponse(BaseModel):
+    cursor: int
+    hasMore: bool = False
+    routines: list[RoutineOut] = []
+    exercises: list[ExerciseOut] = []
+    setTemplates: list[SyncSetTemplate] = []
+    sessions: list[SyncSession] = []
+    deleted: list[SyncDeletion] = []
@@ -0,0 +1,12 @@
+import os
+import sys
+
+import pytest
+
+# Modules import each other flat, as they do when run from api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,115 @@
+import base64
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import auth
+from auth import KeyStore, TokenCache
+
+pytestmark = pytest.mark.anyio
+
+
+def _b64(n: int) -> str:
+    return base64.urlsafe_b64encode(n.to_bytes((n.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+
+def _jwk(kid: str) -> dict:
+    numbers = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_numbers()
+    return {"kty": "RSA", "kid": kid, "n": _b64(numbers.n), "e": _b64(numbers.e)}
+
+
+class FakeKeyStore(KeyStore):
+    """KeyStore whose fetches return (or raise) the scripted responses in order."""
+
+    def __init__(self, *responses):
+        super().__init__("https://jwks.invalid", ttl=60, min_refresh=10)
+        self.responses = list(responses)
+        self.fetches = 0
+
+    async def _fetch(self) -> dict:
+        self.fetches += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+A, B = _jwk("a"), _jwk("b")
+
+
+async def test_keys_are_served_until_the_ttl(clock):
+    store = FakeKeyStore({"keys": [A]}, {"keys": [A, B]})
+    assert await store.get("a") is not None
+    clock[0] += 59
+    assert await store.get("a") is not None
+    assert store.fetches == 1
+    clock[0] += 1
+    assert await store.get("b") is not None
+    assert store.fetches == 2
+
+
+async def test_unknown_kid_refetches_at_most_once_per_min_refresh(clock):
+    store = FakeKeyStore({"keys": [A]}, {"keys": [A]}, {"keys": [A, B]})
+    await store.get("a")
+    clock[0] += 10
+    assert await store.get("b") is None
+    assert await store.get("b") is None
+    assert store.fetches == 2
+    clock[0] += 10
+    assert await store.get("b") is not None
+    assert store.fetches == 3
+
+
+async def test_stale_keys_are_served_when_refresh_fails(clock):
+    store = FakeKeyStore({"keys": [A]}, httpx.ConnectError("down"))
+    await store.get("a")
+    clock[0] += 60
+    assert await store.get("a") is not None
+    assert store.fetches == 2
+
+
+async def test_refresh_failure_without_keys_raises(clock):
+    store = FakeKeyStore(httpx.ConnectError("down"))
+    with pytest.raises(httpx.HTTPError):
+        await store.get("a")
+
+
+def test_load_skips_non_rsa_and_kidless_keys():
+    store = KeyStore("https://jwks.invalid", ttl=60, min_refresh=10)
+    store.load({"keys": [A, {"kty": "EC", "kid": "c"}, {k: v for k, v in B.items() if k != "kid"}]})
+    assert list(store._keys) == ["a"]
+
+
+def test_token_cache_evicts_at_exp(clock):
+    cache = TokenCache(8)
+    cache.put("t", "user", exp=clock[0] + 30)
+    assert cache.get("t") == "user"
+    clock[0] += 30
+    assert cache.get("t") is None
+    assert "t" not in cache._entries
+
+
+def test_token_cache_skips_tokens_without_exp():
+    cache = TokenCache(8)
+    cache.put("t", "user", exp=None)
+    assert cache.get("t") is None
+
+
+def test_token_cache_drops_least_recently_used(clock):
+    cache = TokenCache(2)
+    cache.put("a", "user-a", exp=clock[0] + 60)
+    cache.put("b", "user-b", exp=clock[0] + 60)
+    cache.get("a")
+    cache.put("c", "user-c", exp=clock[0] + 60)
+    assert cache.get("b") is None
+    assert cache.get("a") == "user-a"
+    assert cache.get("c") == "user-c"
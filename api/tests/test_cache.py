@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+import cache
+from cache import MemoryBackend, ResultCache
+from responses import JSON
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_and_set():
+    backend = MemoryBackend(max_bytes=100)
+    assert await backend.get("a") is None
+    await backend.set("a", b"body")
+    assert await backend.get("a") == b"body"
+    assert backend.size == 4
+
+
+async def test_replacing_an_entry_updates_the_size():
+    backend = MemoryBackend(max_bytes=100)
+    await backend.set("a", b"x" * 10)
+    await backend.set("a", b"x" * 3)
+    assert backend.size == 3
+
+
+async def test_evicts_least_recently_used_by_size():
+    backend = MemoryBackend(max_bytes=10)
+    await backend.set("a", b"x" * 4)
+    await backend.set("b", b"x" * 4)
+    await backend.get("a")  # now "b" is the oldest
+    await backend.set("c", b"x" * 4)
+    assert await backend.get("b") is None
+    assert await backend.get("a") is not None
+    assert await backend.get("c") is not None
+    assert backend.size == 8
+
+
+async def test_oversized_body_is_not_stored():
+    backend = MemoryBackend(max_bytes=10)
+    await backend.set("a", b"x" * 4)
+    await backend.set("big", b"x" * 11)
+    assert await backend.get("big") is None
+    assert await backend.get("a") is not None
+
+
+async def test_generation_is_stable_until_invalidated():
+    backend = MemoryBackend(max_bytes=10)
+    first = await backend.generation("u1")
+    assert await backend.generation("u1") == first
+    second = await backend.invalidate("u1")
+    assert second != first
+    assert await backend.generation("u1") == second
+    assert await backend.generation("u2") != second
+
+
+async def test_generations_are_capped(monkeypatch):
+    monkeypatch.setattr(cache, "GENERATIONS_MAX", 2)
+    backend = MemoryBackend(max_bytes=10)
+    u1 = await backend.generation("u1")
+    await backend.generation("u2")
+    await backend.generation("u1")  # now "u2" is the oldest
+    await backend.generation("u3")
+    assert await backend.generation("u1") == u1
+    assert list(backend._generations) == ["u3", "u1"]
+
+
+# ─── Single flight ────────────────────────────────────────────────────────────
+
+class _Computation:
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def test_concurrent_misses_share_one_computation():
+    results = ResultCache(MemoryBackend(max_bytes=1000))
+    compute = _Computation({"ok": True})
+    tasks = [asyncio.create_task(results._single_flight("k", compute, JSON)) for _ in range(3)]
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await asyncio.gather(*tasks) == [b'{"ok":true}'] * 3
+    assert compute.calls == 1
+    assert await results.backend.get("k") == b'{"ok":true}'
+
+
+async def test_waiter_takes_over_when_the_computing_request_is_cancelled():
+    results = ResultCache(MemoryBackend(max_bytes=1000))
+    compute = _Computation({"ok": True})
+    leader = asyncio.create_task(results._single_flight("k", compute, JSON))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(results._single_flight("k", compute, JSON)) for _ in range(2)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await asyncio.gather(*waiters) == [b'{"ok":true}'] * 2
+    assert leader.cancelled()
+    assert compute.calls == 2
+
+
+async def test_cancelled_waiter_leaves_the_computation_running():
+    results = ResultCache(MemoryBackend(max_bytes=1000))
+    compute = _Computation({"ok": True})
+    leader = asyncio.create_task(results._single_flight("k", compute, JSON))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(results._single_flight("k", compute, JSON))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await leader == b'{"ok":true}'
+    assert waiter.cancelled()
+    assert compute.calls == 1
+
+
+async def test_errors_reach_every_waiter():
+    results = ResultCache(MemoryBackend(max_bytes=1000))
+    compute = _Computation(error=ValueError("boom"))
+    tasks = [asyncio.create_task(results._single_flight("k", compute, JSON)) for _ in range(2)]
+    await asyncio.sleep(0)
+    compute.release.set()
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [type(o) for o in outcomes] == [ValueError, ValueError]
+    assert compute.calls == 1
+    assert results._inflight == {}
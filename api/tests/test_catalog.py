@@ -0,0 +1,20 @@
+import pytest
+
+from catalog import normalize
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Dominadas", "dominadas"),
+    ("  Press   banca ", "press banca"),
+    ("Extensión de tríceps", "extension de triceps"),
+    ("EXTENSION DE TRICEPS", "extension de triceps"),
+    ("Fondos\tcon peso", "fondos con peso"),
+    ("Straße", "strasse"),
+    ("", ""),
+])
+def test_normalize(name, key):
+    assert normalize(name) == key
+
+
+def test_precomposed_and_combining_accents_share_a_key():
+    assert normalize("Remo en m\u00e1quina") == normalize("Remo en ma\u0301quina")
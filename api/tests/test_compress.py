@@ -0,0 +1,93 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import compress
+from compress import CODECS, CompressionMiddleware, compress_body
+
+BODY = b'{"entries": [' + b'{"weight": 10, "reps": 8},' * 200 + b"{}]}"
+ETAG = '"v1"'
+
+
+@pytest.mark.parametrize("header, coding", [
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("gzip;q=0", None),
+    ("*;q=0", None),
+])
+def test_negotiate(header, coding):
+    assert compress.negotiate(header) == coding
+
+
+def test_negotiate_prefers_server_order_on_ties():
+    assert compress.negotiate("*") == next(iter(CODECS))
+    assert compress.negotiate(", ".join(reversed(CODECS))) == next(iter(CODECS))
+
+
+def test_negotiate_honours_q():
+    assert compress.negotiate("*;q=0.5, gzip") == "gzip"
+
+
+def test_gzip_round_trip():
+    assert gzip.decompress(compress_body("gzip", BODY)) == BODY
+
+
+def _client(body: bytes = BODY) -> tuple[TestClient, list]:
+    seen = []
+
+    async def endpoint(request: Request):
+        if_none_match = request.headers.get("if-none-match")
+        seen.append(if_none_match)
+        if if_none_match == ETAG:
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return Response(body, media_type="application/json", headers={"ETag": ETAG})
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app), seen
+
+
+def test_compressed_response_gets_tagged_etag():
+    client, _ = _client()
+    resp = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["etag"] == '"v1-gzip"'
+    assert "accept-encoding" in resp.headers["vary"].lower()
+    assert resp.content == BODY
+
+
+def test_identity_response_keeps_etag():
+    client, _ = _client()
+    resp = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["etag"] == ETAG
+    assert resp.content == BODY
+
+
+def test_small_body_is_not_compressed_or_tagged():
+    client, _ = _client(b'{"ok": true}')
+    resp = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["etag"] == ETAG
+
+
+def test_tagged_if_none_match_revalidates():
+    client, seen = _client()
+    resp = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1-gzip"'})
+    assert seen == [ETAG]
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == '"v1-gzip"'
+
+
+def test_304_for_identity_tag_stays_untagged():
+    client, _ = _client()
+    resp = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": ETAG})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == ETAG
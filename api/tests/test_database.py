@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.pool.base import _ConnDialect
+from sqlalchemy.util import greenlet_spawn
+
+import database
+from database import InstrumentedPool
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _pool(**kwargs) -> InstrumentedPool:
+    return InstrumentedPool(FakeConnection, pool_size=1, max_overflow=0, timeout=0.2, **kwargs)
+
+
+async def test_checkout_with_idle_connection_does_not_wait():
+    pool = _pool()
+    first = await greenlet_spawn(pool.connect)
+    first.close()
+    second = await greenlet_spawn(pool.connect)
+    assert pool.stats()["waiting"] == 0
+    assert pool.stats()["checkouts"] == 2
+    second.close()
+
+
+async def test_waiting_counts_blocked_checkouts():
+    pool = _pool()
+    held = await greenlet_spawn(pool.connect)
+    blocked = asyncio.create_task(greenlet_spawn(pool.connect))
+    await asyncio.sleep(0.05)
+    assert pool.stats()["waiting"] == 1
+    await greenlet_spawn(held.close)
+    (await blocked).close()
+    stats = pool.stats()
+    assert stats["waiting"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["checkout_wait_seconds_max"] >= 0.04
+
+
+async def test_timeouts_are_not_checkouts():
+    pool = _pool()
+    held = await greenlet_spawn(pool.connect)
+    with pytest.raises(exc.TimeoutError):
+        await greenlet_spawn(pool.connect)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["waiting"] == 0
+    held.close()
+
+
+class SlowPingDialect(_ConnDialect):
+    def _do_ping_w_event(self, dbapi_connection):
+        time.sleep(0.1)
+        return True
+
+
+async def test_wait_excludes_pre_ping():
+    pool = _pool(pre_ping=True, dialect=SlowPingDialect())
+    (await greenlet_spawn(pool.connect)).close()
+    started = time.perf_counter()
+    # A reused connection is pinged before it is handed out
+    (await greenlet_spawn(pool.connect)).close()
+    assert time.perf_counter() - started >= 0.1
+    assert pool.stats()["checkout_wait_seconds_max"] < 0.05
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    monkeypatch.setattr(database, "read_engine", object())
+    monkeypatch.setattr(database, "_pinned_until", OrderedDict())
+    clock = [1000.0]
+    monkeypatch.setattr(database, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 5.0)
+    return clock
+
+
+def test_pin_expires(replica):
+    database.pin_to_primary("u1")
+    assert database._is_pinned("u1")
+    replica[0] += 5
+    assert not database._is_pinned("u1")
+
+
+def test_expired_pins_are_pruned(replica):
+    for i in range(100):
+        database.pin_to_primary(f"user-{i}")
+    replica[0] += 3
+    database.pin_to_primary("user-0")  # renewed, now the newest
+    replica[0] += 3
+    database.pin_to_primary("latest")
+    assert list(database._pinned_until) == ["user-0", "latest"]
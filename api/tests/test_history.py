@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from routers.history import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    finished_at = datetime(2026, 9, 30, 23, 0, tzinfo=timezone.utc)
+    assert _decode_cursor(_encode_cursor(finished_at, 42)) == (finished_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "bm9waXBl",  # "nopipe"
+    "MjAyNi0wOS0zMHx4",  # "2026-09-30|x"
+    "eHx8eA==",  # "x||x"
+    "__8=",  # not UTF-8
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as e:
+        _decode_cursor(cursor)
+    assert e.value.status_code == 422
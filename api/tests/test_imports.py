@@ -0,0 +1,59 @@
+import pytest
+
+from routers.imports import _records
+
+pytestmark = pytest.mark.anyio
+
+
+async def _collect(*chunks: bytes) -> list[list[tuple[int, list[str]]]]:
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    return [records async for records in _records(body())]
+
+
+async def _fields(*chunks: bytes) -> list[tuple[int, list[str]]]:
+    return [record for records in await _collect(*chunks) for record in records]
+
+
+async def test_records_split_across_chunks():
+    assert await _fields(b"date,exer", b"cise\n2026-10-01,Domi", b"nadas\n") == [
+        (1, ["date", "exercise"]),
+        (2, ["2026-10-01", "Dominadas"]),
+    ]
+
+
+async def test_last_line_without_newline():
+    assert await _fields(b"a,b\n1,2") == [(1, ["a", "b"]), (2, ["1", "2"])]
+
+
+async def test_quoted_newline_is_held_back():
+    batches = await _collect(b'a,b\n1,"two\n', b'lines"\n3,4\n')
+    assert batches[0] == [(1, ["a", "b"])]
+    assert [r for batch in batches for r in batch] == [
+        (1, ["a", "b"]),
+        (2, ["1", "two\nlines"]),
+        (3, ["3", "4"]),
+    ]
+
+
+async def test_multibyte_character_split_across_chunks():
+    data = "exercise\nSentadilla búlgara\n".encode()
+    cut = data.index("ú".encode()) + 1
+    assert await _fields(data[:cut], data[cut:]) == [(1, ["exercise"]), (2, ["Sentadilla búlgara"])]
+
+
+async def test_bom_and_semicolons():
+    assert await _fields("\ufeffdate;weight\n2026-10-01;12,5\n".encode()) == [
+        (1, ["date", "weight"]),
+        (2, ["2026-10-01", "12,5"]),
+    ]
+
+
+async def test_blank_lines_keep_record_numbers():
+    assert await _fields(b"a\n\n1\n") == [(1, ["a"]), (3, ["1"])]
+
+
+async def test_empty_body():
+    assert await _collect(b"") == []
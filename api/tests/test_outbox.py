@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from outbox import _streak
+
+# A Wednesday; its week starts on Monday 2026-10-12
+TODAY = date(2026, 10, 14)
+THIS_WEEK = date(2026, 10, 12)
+
+
+def _weeks(*ago):
+    return {THIS_WEEK - timedelta(weeks=n) for n in ago}
+
+
+def test_no_sessions():
+    assert _streak(set(), TODAY) == 0
+
+
+def test_counts_back_from_this_week():
+    assert _streak(_weeks(0, 1, 2), TODAY) == 3
+
+
+def test_unfinished_week_does_not_break_the_streak():
+    assert _streak(_weeks(1, 2), TODAY) == 2
+
+
+def test_gap_ends_the_streak():
+    assert _streak(_weeks(0, 1, 3, 4), TODAY) == 2
+
+
+def test_streak_ended_before_last_week():
+    assert _streak(_weeks(2, 3), TODAY) == 0
+
+
+def test_monday_and_sunday_belong_to_the_same_week():
+    assert _streak(_weeks(0), THIS_WEEK) == 1
+    assert _streak(_weeks(0), THIS_WEEK + timedelta(days=6)) == 1
@@ -0,0 +1,105 @@
+"""Query plans of the /history endpoints against a checked-in snapshot.
+
+Needs a throwaway Postgres: set TEST_DATABASE_URL (an asyncpg URL). The
+schema and data are created inside a transaction that is rolled back, and
+the plans are the ones the planner picks with its normal settings on a
+few hundred thousand analyzed sets. After a deliberate query or index
+change, rewrite the snapshot with UPDATE_PLAN_SNAPSHOT=1 and review the
+diff.
+"""
+import json
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import catalog
+import migrations
+import models
+import rollups
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SNAPSHOT = Path(__file__).with_name("plans.json")
+
+USERS = 100
+SESSIONS = 15000  # across all users, one every three hours
+EXERCISES = ["Dominadas", "Fondos", "Remo en anillas", "Flexiones",
+             "Sentadilla búlgara", "Dominadas lastradas", "Plancha", "Press militar"]
+USER = "user-0"
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+async def _seed(conn):
+    await conn.run_sync(models.Base.metadata.create_all)
+    await migrations.run_migrations(conn)
+    db = AsyncSession(bind=conn)
+    ids = list((await catalog.resolve(db, USER, EXERCISES)).values())
+    await conn.execute(text(
+        "INSERT INTO workout_sessions "
+        "(user_id, routine_name, started_at, finished_at, total_volume_kg, client_id) "
+        "SELECT 'user-' || (g % :users), 'Rutina', "
+        "now() - g * interval '3 hours' - interval '1 hour', now() - g * interval '3 hours', "
+        "0, 'plan-' || g "
+        "FROM generate_series(1, :sessions) g"
+    ), {"users": USERS, "sessions": SESSIONS})
+    # Half the exercises in each session, three sets each
+    await conn.execute(text(
+        "INSERT INTO session_sets (session_id, exercise_id, weight, reps, rpe) "
+        "SELECT s.id, e.id, (s.id + n) % 4 * 5, 5 + (s.id + n) % 8, 8 "
+        "FROM workout_sessions s "
+        "CROSS JOIN unnest(CAST(:ids AS integer[])) AS e(id) "
+        "CROSS JOIN generate_series(1, 3) n "
+        "WHERE (s.id + e.id) % 2 = 0 "
+        "ORDER BY s.id"  # as the app writes them: a session's sets together
+    ), {"ids": ids})
+    await rollups.rebuild(db)
+    await conn.execute(text("ANALYZE"))
+
+
+def _shape(plan: dict, depth: int = 0) -> list[str]:
+    """Node types with the tables and indexes they use, one line per node."""
+    line = "  " * depth + plan["Node Type"]
+    if plan["Node Type"] == "Bitmap Index Scan":
+        # Several indexes lead with user_id and tie on a bare equality; which
+        # one the planner takes is arbitrary, the condition it serves is not
+        line += f" for {plan['Index Cond']}"
+    elif "Index Name" in plan:
+        line += f" using {plan['Index Name']}"
+    if "Relation Name" in plan:
+        line += f" on {plan['Relation Name']}"
+    lines = [line]
+    for child in plan.get("Plans", []):
+        lines.extend(_shape(child, depth + 1))
+    return lines
+
+
+async def test_history_plans_match_snapshot():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                await _seed(conn)
+                plans = await migrations.history_plans(conn, USER, EXERCISES[0])
+            finally:
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+
+    shapes = {
+        endpoint: [_shape(plan) for plan in endpoint_plans]
+        for endpoint, endpoint_plans in plans.items()
+    }
+    for endpoint, endpoint_plans in plans.items():
+        for plan in endpoint_plans:
+            assert not migrations._seq_scans(plan), f"/history/{endpoint}:\n" + "\n".join(_shape(plan))
+
+    if os.getenv("UPDATE_PLAN_SNAPSHOT"):
+        SNAPSHOT.write_text(json.dumps(shapes, indent=2, ensure_ascii=False) + "\n")
+    assert shapes == json.loads(SNAPSHOT.read_text())
@@ -0,0 +1,71 @@
+import pytest
+
+import records
+
+RINGS = None  # nivel_anillas for sets not done on rings
+
+
+def _row(exercise, session, weight, reps, level=RINGS, finished=None):
+    return (exercise, session, finished if finished is not None else 86400.0 * session, weight, reps, level)
+
+
+def test_empty():
+    assert records.compute([], {}) == []
+
+
+def test_best_set_by_estimated_1rm():
+    rows = [_row(1, 1, 100, 1), _row(1, 2, 90, 5), _row(1, 2, 60, 10)]
+    [record] = records.compute(rows, {1: "Dominadas"})
+    assert record["name"] == "Dominadas"
+    assert record["bestSet"]["weight"] == 90
+    assert record["bestSet"]["reps"] == 5
+    assert record["bestSet"]["estimated1RM"] == 105.0
+    assert record["bestSet"]["sessionId"] == 2
+
+
+def test_zero_rep_set_is_not_best_set():
+    rows = [_row(1, 1, 100, 0), _row(1, 1, 50, 5)]
+    [record] = records.compute(rows, {})
+    assert record["bestSet"]["weight"] == 50
+
+
+def test_no_best_set_without_load():
+    rows = [_row(1, 1, 0, 12), _row(2, 1, 80, 0)]
+    bodyweight, failed = records.compute(rows, {})
+    assert bodyweight["bestSet"] is None
+    assert failed["bestSet"] is None
+    assert bodyweight["maxReps"] == 12
+
+
+def test_brzycki():
+    [record] = records.compute([_row(1, 1, 100, 10)], {}, "brzycki")
+    assert record["bestSet"]["estimated1RM"] == pytest.approx(133.3)
+
+
+def test_rep_maxes_carry_down():
+    # 80 kg for 5 is also a 1RM..4RM of at least 80
+    rows = [_row(1, 1, 80, 5), _row(1, 2, 90, 1), _row(1, 3, 20, 20)]
+    [record] = records.compute(rows, {})
+    assert record["repMaxes"][:6] == [90.0, 80.0, 80.0, 80.0, 80.0, 20.0]
+    assert record["repMaxes"][11] == 20.0
+
+
+def test_best_session_volume():
+    rows = [_row(1, 1, 10, 10), _row(1, 1, 10, 10), _row(1, 2, 50, 3)]
+    [record] = records.compute(rows, {})
+    assert record["bestSessionVolume"]["volume"] == 200.0
+    assert record["bestSessionVolume"]["sessionId"] == 1
+
+
+def test_ring_levels():
+    rows = [
+        _row(1, 1, 0, 5, level=3),
+        _row(1, 1, 0, 8, level=3),
+        _row(1, 2, 0, 6, level=3),
+        _row(1, 2, 0, 4, level=5),
+    ]
+    [record] = records.compute(rows, {})
+    low, high = record["ringLevels"]
+    assert (low["level"], low["maxReps"], low["sets"], low["sessions"]) == (3, 8, 3, 2)
+    assert (high["level"], high["maxReps"], high["sets"], high["sessions"]) == (5, 4, 1, 1)
+    assert low["firstAt"] < low["lastAt"]
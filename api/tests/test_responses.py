@@ -0,0 +1,39 @@
+from starlette.requests import Request
+
+import responses
+from responses import JSON, MSGPACK, accept_weights
+
+
+def _request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+def test_accept_weights():
+    assert accept_weights("gzip, br;q=0.8, ZSTD;q=0") == {"gzip": 1.0, "br": 0.8, "zstd": 0.0}
+
+
+def test_accept_weights_ignores_empty_items_and_other_params():
+    assert accept_weights(" , application/json; charset=utf-8 ,") == {"application/json": 1.0}
+    assert accept_weights("") == {}
+
+
+def test_accept_weights_bad_q_refuses():
+    assert accept_weights("gzip;q=high") == {"gzip": 0.0}
+
+
+def test_negotiate_defaults_to_json(monkeypatch):
+    monkeypatch.setattr(responses, "ormsgpack", object())
+    assert responses.negotiate(None) == JSON
+    assert responses.negotiate(_request("application/json, */*")) == JSON
+    assert responses.negotiate(_request("application/msgpack;q=0")) == JSON
+
+
+def test_negotiate_msgpack(monkeypatch):
+    monkeypatch.setattr(responses, "ormsgpack", object())
+    assert responses.negotiate(_request("application/msgpack, application/json;q=0.5")) == MSGPACK
+    assert responses.negotiate(_request("application/x-msgpack")) == MSGPACK
+
+
+def test_negotiate_without_ormsgpack(monkeypatch):
+    monkeypatch.setattr(responses, "ormsgpack", None)
+    assert responses.negotiate(_request("application/msgpack")) == JSON
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from routers.routines import _match, _unmatched
+
+
+def _rows(*ids):
+    return [SimpleNamespace(id=i) for i in ids]
+
+
+def _items(*ids):
+    return [SimpleNamespace(id=i) for i in ids]
+
+
+def _ids(matched):
+    return [row.id if row is not None else None for row in matched]
+
+
+def test_items_with_ids_match_by_id_regardless_of_order():
+    stored = _rows(1, 2, 3)
+    assert _ids(_match(_items(3, 1, 2), stored)) == [3, 1, 2]
+
+
+def test_items_without_ids_fall_back_to_position():
+    stored = _rows(1, 2)
+    assert _ids(_match(_items(None, None, None), stored)) == [1, 2, None]
+
+
+def test_position_fallback_skips_rows_claimed_by_id():
+    # Row 1 moved to the end; the new item at index 0 must not take it
+    stored = _rows(1, 2)
+    assert _ids(_match(_items(None, 2, 1), stored)) == [None, 2, 1]
+
+
+def test_unknown_ids_insert_afresh():
+    stored = _rows(1)
+    assert _ids(_match(_items(99, 1), stored)) == [None, 1]
+
+
+def test_a_row_is_matched_at_most_once():
+    stored = _rows(1)
+    assert _ids(_match(_items(1, 1), stored)) == [1, None]
+
+
+def test_unmatched_rows_are_deleted():
+    stored = _rows(1, 2, 3)
+    matched = _match(_items(3), stored)
+    assert _unmatched(stored, matched) == [1, 2]
@@ -0,0 +1,91 @@
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import get_current_user_id
+from database import get_read_db, pin_to_primary
+from models import UserDataVersion, change_sequence
+from responses import negotiate
+
+
+# ─── Per-user data version ────────────────────────────────────────────────────
+# Every write path bumps the user's version inside its transaction. Reads
+# derive validators from it without touching the tables they serve.
+
+async def bump(db: AsyncSession, user_id: str):
+    pin_to_primary(user_id)
+    stmt = pg_insert(UserDataVersion).values(user_id=user_id, version=change_sequence.next_value())
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id"], set_={"version": stmt.excluded.version}
+    ))
+
+
+async def current(db: AsyncSession, user_id: str) -> int:
+    result = await db.execute(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    )
+    return result.scalar() or 0
+
+
+# ─── Sync write barrier ───────────────────────────────────────────────────────
+# change_seq numbers are handed out before commit, so a transaction still in
+# flight can hold numbers below the bound GET /sync has already read. Every
+# writer of synced rows holds this per-user lock shared, taken before its
+# first stamp; /sync takes it exclusively before reading the sequence, which
+# waits out those writers.
+
+SYNC_LOCK_NAMESPACE = 0x53594E43  # advisory lock classid, "SYNC"
+
+
+async def begin_write(db: AsyncSession, user_id: str):
+    await db.execute(select(
+        func.pg_advisory_xact_lock_shared(SYNC_LOCK_NAMESPACE, func.hashtext(user_id))
+    ))
+
+
+async def wait_for_writes(db: AsyncSession, user_id: str):
+    await db.execute(select(
+        func.pg_advisory_xact_lock(SYNC_LOCK_NAMESPACE, func.hashtext(user_id))
+    ))
+
+
+# ─── Conditional GET ──────────────────────────────────────────────────────────
+
+def _etag(user_id: str, version: int, request: Request) -> str:
+    # One tag per representation: the JSON and MessagePack bodies differ
+    key = f"{user_id}:{version}:{negotiate(request)}:{request.url.path}?{request.url.query}"
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    return etag in candidates
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Route dependency: answer 304 before the handler runs if nothing changed.
+
+    Reads the version through the same session as the handler, so the ETag
+    always matches the snapshot (primary or replica) the body comes from.
+    """
+    await check_unchanged(db, request, response, user_id)
+
+
+async def check_unchanged(db: AsyncSession, request: Request, response: Response, user_id: str):
+    """conditional_get for handlers that manage their own sessions."""
+    etag = _etag(user_id, await current(db, user_id), request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
@@ -9,7 +9,7 @@ import { useFocusEffect } from '@react-navigation/native';
 import { NativeStackNavigationProp } from '@react-navigation/native-stack';
 import { useAuth as useClerkAuth } from '@clerk/clerk-expo';
 import { RootStackParamList } from '../App';
-import { RoutineRow, getRoutines } from '../services/api';
+import { RoutineRow, getDashboard } from '../services/api';
 import { Colors } from '../constants/colors';
 import { useAuth } from '../context/AuthContext';
 
@@ -19,6 +19,14 @@ const PRIMARY_TAGS = ['Anillas', 'Barra'];
 const ALL_DAYS = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom'];
 const TODAY = ALL_DAYS[new Date().getDay() === 0 ? 6 : new Date().getDay() - 1];
 
+// Local midnight of this week's Monday, as the instant /dashboard counts the week from
+function weekStart(): string {
+  const start = new Date();
+  start.setDate(start.getDate() - ((start.getDay() + 6) % 7));
+  start.setHours(0, 0, 0, 0);
+  return start.toISOString();
+}
+
 function RoutineCard({ routine, onStart, onDetail }: {
   routine: RoutineRow;
   onStart: () => void;
@@ -132,8 +140,8 @@ export default function DashboardScreen() {
     if (!userId) return;
     const token = await getToken();
     if (!token) return;
-    const rows = await getRoutines(token);
-    setRoutines(rows);
+    const dashboard = await getDashboard(token, TODAY, weekStart());
+    setRoutines(dashboard.routines);
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [userId]);
 
@@ -1,11 +1,11 @@
-import React, { useState, useCallback, useEffect } from 'react';
+import React, { useState, useCallback, useEffect, useRef } from 'react';
 import { View, Text, ScrollView, TouchableOpacity, TextInput, StyleSheet } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { Ionicons } from '@expo/vector-icons';
 import { useFocusEffect } from '@react-navigation/native';
 import { useAuth as useClerkAuth } from '@clerk/clerk-expo';
 import {
-  getExerciseNames, getExerciseStats, getExerciseHistory, getVolumeProgression,
+  getExerciseNames, getExerciseOverview, getExerciseStats,
   ExerciseStats, HistoryEntry, VolumePoint, SetDetail,
 } from '../services/api';
 import { Colors } from '../constants/colors';
@@ -149,33 +149,35 @@ export default function ExerciseHistoryScreen() {
 
   useFocusEffect(useCallback(() => { loadNames(); }, [loadNames]));
 
-  // Reload history + volume when selected exercise changes
+  // History and volume don't depend on the period, so the overview is fetched
+  // once per exercise; period toggles after that only refetch the stats.
+  // statsPeriod records which period the stats on screen were computed for.
+  const statsPeriod = useRef<Period | null>(null);
+
   useEffect(() => {
     if (!selectedName || !userId) return;
+    statsPeriod.current = period;
     (async () => {
       const token = await getToken();
       if (!token) return;
-      const [h, v] = await Promise.all([
-        getExerciseHistory(token, selectedName),
-        getVolumeProgression(token, selectedName),
-      ]);
-      setHistory(h);
-      setVolume(v);
+      const overview = await getExerciseOverview(token, selectedName, getPeriodStart(period));
+      setStats(overview.stats);
+      setHistory(overview.history.entries);
+      setVolume(overview.volume);
     })();
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [selectedName, userId]);
 
-  // Reload stats when exercise OR period changes
   useEffect(() => {
-    if (!selectedName || !userId) return;
+    if (!selectedName || !userId || statsPeriod.current === period) return;
+    statsPeriod.current = period;
     (async () => {
       const token = await getToken();
       if (!token) return;
-      const s = await getExerciseStats(token, selectedName, getPeriodStart(period));
-      setStats(s);
+      setStats(await getExerciseStats(token, selectedName, getPeriodStart(period)));
     })();
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [selectedName, period, userId]);
+  }, [period]);
 
   const onSelectExercise = (name: string) => setSelectedName(name);
 
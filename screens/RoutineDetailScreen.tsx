@@ -18,9 +18,10 @@ type Props = {
   route: RouteProp<RootStackParamList, 'RoutineDetail'>;
 };
 
-interface SetRow { id: number; sets: string; reps: string; weight: string; nivel: string; }
+interface SetRow { id: number; serverId?: number; sets: string; reps: string; weight: string; nivel: string; }
 interface LocalExercise {
   id: number;
+  serverId?: number;  // stored id; unset for exercises added here
   name: string;
   muscle: string;
   equipment: string[];
@@ -54,11 +55,12 @@ export default function RoutineDetailScreen({ navigation, route }: Props) {
       setExercises(
         exs.map((ex, i) => ({
           id: i + 1,
+          serverId: ex.id,
           name: ex.name,
           muscle: ex.muscle,
           equipment: JSON.parse(ex.equipment ?? '[]'),
           restSeconds: ex.rest_seconds ?? 90,
-          rows: ex.rows.map((r, j) => ({ id: j + 1, sets: r.sets, reps: r.reps, weight: r.weight, nivel: r.nivel_anillas ?? '' })),
+          rows: ex.rows.map((r, j) => ({ id: j + 1, serverId: r.id, sets: r.sets, reps: r.reps, weight: r.weight, nivel: r.nivel_anillas ?? '' })),
         }))
       );
       setLoading(false);
@@ -158,11 +160,12 @@ export default function RoutineDetailScreen({ navigation, route }: Props) {
       tags: [],
       scheduleDays: schedule,
       exercises: exercises.map((ex) => ({
+        id: ex.serverId,
         name: ex.name,
         muscle: ex.muscle,
         equipment: ex.equipment,
         rest_seconds: ex.restSeconds,
-        rows: ex.rows.map((r) => ({ sets: r.sets, reps: r.reps, weight: r.weight, nivel: r.nivel })),
+        rows: ex.rows.map((r) => ({ id: r.serverId, sets: r.sets, reps: r.reps, weight: r.weight, nivel: r.nivel })),
       })),
     });
     goBack();
@@ -17,6 +17,7 @@ export interface RoutineRow {
 export interface ExerciseRow {
   id: number;
   routine_id: number;
+  exercise_id: number | null;  // catalog id
   name: string;
   muscle: string;
   equipment: string;  // JSON string[]
@@ -24,6 +25,14 @@ export interface ExerciseRow {
   sort_order: number;
 }
 
+export interface CatalogExercise {
+  id: number;
+  name: string;
+  muscle: string;
+  equipment: string;  // JSON string[]
+  custom: boolean;
+}
+
 export interface SetTemplateRow {
   id: number;
   exercise_id: number;
@@ -39,6 +48,7 @@ export interface ExerciseWithSets extends ExerciseRow {
 }
 
 export interface SessionSetInput {
+  exerciseId?: number;
   exerciseName: string;
   weight: number;
   reps: number;
@@ -77,12 +87,54 @@ export interface HistoryEntry {
   totalVolume: number;
 }
 
+export interface HistoryPage {
+  entries: HistoryEntry[];
+  nextCursor: string | null;
+}
+
 export interface VolumePoint {
   month: string;
   volume: number;
   label: string;
 }
 
+export interface ExerciseOverview {
+  stats: ExerciseStats;
+  history: HistoryPage;
+  volume: VolumePoint[];
+}
+
+export interface DashboardData {
+  routines: RoutineRow[];
+  todayRoutineIds: number[];
+  recentSessions: Array<{
+    id: number;
+    routineId: number | null;
+    routineName: string;
+    finishedAt: string | null;
+    totalVolumeKg: number;
+  }>;
+  weekVolumeKg: number;
+  weekSessions: number;
+}
+
+export interface SyncSession extends Omit<SessionInput, 'routineId'> {
+  id: number;
+  // null once the routine has been deleted
+  routineId: number | null;
+  clientId: string | null;
+}
+
+export interface SyncResponse {
+  cursor: number;
+  hasMore: boolean;
+  routines: RoutineRow[];
+  exercises: ExerciseRow[];
+  setTemplates: SetTemplateRow[];
+  sessions: SyncSession[];
+  deleted: Array<{ entity: 'routine' | 'exercise' | 'set_template'; id: number }>;
+}
+
 // ─── Core fetch ───────────────────────────────────────────────────────────────
 
 const API_URL = process.env.EXPO_PUBLIC_API_URL ?? 'http://localhost:8000';
@@ -110,8 +162,22 @@ async function apiFetch<T>(
 
 // ─── Routines ─────────────────────────────────────────────────────────────────
 
-export async function getRoutines(token: string): Promise<RoutineRow[]> {
-  return apiFetch('/routines', token);
+export interface RoutineFilters {
+  day?: string;        // schedule day label, e.g. 'Lun'
+  tag?: string;
+  equipment?: string;  // any exercise in the routine uses it
+  limit?: number;
+  offset?: number;
+}
+
+export async function getRoutines(
+  token: string,
+  filters: RoutineFilters = {}
+): Promise<RoutineRow[]> {
+  const params = Object.entries(filters)
+    .filter(([, value]) => value !== undefined)
+    .map(([key, value]) => `${key}=${encodeURIComponent(String(value))}`);
+  return apiFetch(params.length ? `/routines?${params.join('&')}` : '/routines', token);
 }
 
 export async function getRoutineWithExercises(
@@ -130,11 +196,12 @@ export async function saveRoutine(
     tags: string[];
     scheduleDays: string[];
     exercises: Array<{
+      id?: number;  // stored exercise to update; matched by position without it
       name: string;
       muscle: string;
       equipment: string[];
       rest_seconds: number;
-      rows: Array<{ sets: string; reps: string; weight: string; nivel: string }>;
+      rows: Array<{ id?: number; sets: string; reps: string; weight: string; nivel: string }>;
     }>;
   }
 ): Promise<number> {
@@ -151,6 +218,23 @@ export async function deleteRoutine(token: string, routineId: number): Promise<v
   return apiFetch(`/routines/${routineId}`, token, { method: 'DELETE' });
 }
 
+export async function getDashboard(
+  token: string,
+  day: string,
+  weekStart: string
+): Promise<DashboardData> {
+  return apiFetch(
+    `/dashboard?day=${encodeURIComponent(day)}&week_start=${encodeURIComponent(weekStart)}`,
+    token
+  );
+}
+
+// ─── Exercise catalog ─────────────────────────────────────────────────────────
+
+export async function getExerciseCatalog(token: string): Promise<CatalogExercise[]> {
+  return apiFetch('/exercises', token);
+}
+
 // ─── Sessions ─────────────────────────────────────────────────────────────────
 
 export async function saveSession(token: string, data: SessionInput): Promise<void> {
@@ -177,11 +261,21 @@ export async function getExerciseStats(
   );
 }
 
+export async function getExerciseHistoryPage(
+  token: string,
+  exerciseName: string,
+  cursor?: string | null
+): Promise<HistoryPage> {
+  const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+  return apiFetch(`/history/sessions?name=${encodeURIComponent(exerciseName)}${query}`, token);
+}
+
 export async function getExerciseHistory(
   token: string,
   exerciseName: string
 ): Promise<HistoryEntry[]> {
-  return apiFetch(`/history/sessions?name=${encodeURIComponent(exerciseName)}`, token);
+  const page = await getExerciseHistoryPage(token, exerciseName);
+  return page.entries;
 }
 
 export async function getVolumeProgression(
@@ -190,3 +284,69 @@ export async function getVolumeProgression(
 ): Promise<VolumePoint[]> {
   return apiFetch(`/history/volume?name=${encodeURIComponent(exerciseName)}`, token);
 }
+
+export async function getExerciseOverview(
+  token: string,
+  exerciseName: string,
+  since: string
+): Promise<ExerciseOverview> {
+  return apiFetch(
+    `/history/overview?name=${encodeURIComponent(exerciseName)}&since=${encodeURIComponent(since)}`,
+    token
+  );
+}
+
+export interface ExerciseRecords {
+  exerciseId: number;
+  name: string;
+  bestSet: {
+    weight: number;
+    reps: number;
+    estimated1RM: number;
+    sessionId: number;
+    finishedAt: string;
+  } | null;
+  maxReps: number;
+  repMaxes: Array<number | null>;  // [1RM, 2RM, ..., 12RM]
+  bestSessionVolume: { volume: number; sessionId: number; finishedAt: string };
+  ringLevels: Array<{
+    level: number;
+    maxReps: number;
+    sets: number;
+    sessions: number;
+    firstAt: string;
+    lastAt: string;
+  }>;
+}
+
+export async function getPersonalRecords(
+  token: string,
+  formula: 'epley' | 'brzycki' = 'epley'
+): Promise<ExerciseRecords[]> {
+  return apiFetch(`/history/records?formula=${formula}`, token);
+}
+
+// ─── Import ───────────────────────────────────────────────────────────────────
+
+export interface ImportReport {
+  rows: number;
+  sessionsCreated: number;
+  duplicateSessions: number;
+  setsCreated: number;
+  errorCount: number;
+  errors: Array<{ row: number; error: string }>;
+}
+
+export async function importHistory(token: string, csv: string | Blob): Promise<ImportReport> {
+  return apiFetch('/import', token, {
+    method: 'POST',
+    headers: { 'Content-Type': 'text/csv' },
+    body: csv,
+  });
+}
+
+// ─── Sync ─────────────────────────────────────────────────────────────────────
+
+export async function syncChanges(token: string, since: number): Promise<SyncResponse> {
+  return apiFetch(`/sync?since=${since}`, token);
+}